@@ -0,0 +1,116 @@
+"""
+Local stand-in for data.guldu.uz.
+
+Serves the faculty index, per-faculty group pages and ajax.php timetable
+responses. Timetables come from the recorded pages in bench/fixtures
+(ajax_*.html), picked per group so every group always gets the same page.
+Every request can be delayed by an injectable latency.
+"""
+import glob
+import os
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 refuses connections under load
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class FakeGulDU:
+    def __init__(self, faculties: int = 5, groups_per_faculty: int = 20, latency: float = 0.0):
+        self.latency = latency
+        self.faculties: Dict[str, str] = {str(i): f"Fakultet {i}" for i in range(1, faculties + 1)}
+        self.groups: Dict[str, List[str]] = {
+            fid: [f"{fid}{g:02d}-2{g % 4}" for g in range(1, groups_per_faculty + 1)]
+            for fid in self.faculties
+        }
+        self.ajax_pages = [
+            open(path, "rb").read() for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "ajax_*.html")))
+        ]
+        # path -> number of requests
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/dars/"
+
+    def start(self) -> "FakeGulDU":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, path: str) -> int:
+        with self._lock:
+            return self.requests.get(path, 0)
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.requests.clear()
+
+    def _record(self, path: str) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def index_page(self) -> bytes:
+        links = "".join(
+            f'<div class="col-md-4"><a class="btn btn-primary" href="index.php?fak={fid}">{name}</a></div>'
+            for fid, name in self.faculties.items()
+        )
+        return f'<html><body><div class="row">{links}</div></body></html>'.encode()
+
+    def faculty_page(self, faculty_id: str) -> bytes:
+        groups = "".join(f"<h3>{group}</h3>" for group in self.groups.get(faculty_id, []))
+        return f"<html><body>{groups}</body></html>".encode()
+
+    def ajax_page(self, group: str) -> bytes:
+        return self.ajax_pages[zlib.crc32(group.encode()) % len(self.ajax_pages)]
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, body: bytes, status: int = 200) -> None:
+                if fake.latency:
+                    time.sleep(fake.latency)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                fake._record(url.path)
+                if url.path.endswith("/index.php"):
+                    faculty_id = parse_qs(url.query).get("fak", [""])[0]
+                    self._reply(fake.faculty_page(faculty_id))
+                else:
+                    self._reply(fake.index_page())
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                fake._record(url.path)
+                length = int(self.headers.get("Content-Length", 0))
+                form = parse_qs(self.rfile.read(length).decode())
+                self._reply(fake.ajax_page(form.get("q", [""])[0]))
+
+        return Handler
@@ -0,0 +1,173 @@
+"""
+Local stand-in for the Telegram Bot API.
+
+Implements just enough of the API for the bot to run against it: getMe,
+getUpdates (long polling), sendMessage and no-op answers for everything
+else. Commands are injected with `inject`, and each reply is matched to
+its command to measure end-to-end latency. With `flood_limit` set, sends
+above that many per second get a 429 with `retry_after`, like the real API.
+"""
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 refuses connections under load
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class FakeTelegram:
+    def __init__(self, flood_limit: Optional[int] = None, retry_after: int = 1):
+        self.flood_limit = flood_limit
+        self.retry_after = retry_after
+        self._updates: List[Dict[str, Any]] = []
+        self._next_update_id = 1
+        self._cond = threading.Condition()
+        # chat_id -> injection times of commands still waiting for a reply
+        self._pending: Dict[int, Deque[float]] = defaultdict(deque)
+        # (sent_at, chat_id)
+        self.sent: List[Tuple[float, int]] = []
+        self.latencies: List[float] = []
+        self.flood_rejections = 0
+        self._recent_sends: Deque[float] = deque()
+        self._server = _Server(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/bot"
+
+    def start(self) -> "FakeTelegram":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self) -> None:
+        with self._cond:
+            self._pending.clear()
+            self.sent.clear()
+            self.latencies.clear()
+            self.flood_rejections = 0
+
+    def inject(self, user_id: int, text: str) -> None:
+        """Queues an incoming private message, as if the user had sent it."""
+        message: Dict[str, Any] = {
+            "message_id": self._next_update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        with self._cond:
+            self._updates.append({"update_id": self._next_update_id, "message": message})
+            self._next_update_id += 1
+            self._pending[user_id].append(time.monotonic())
+            self._cond.notify_all()
+
+    def wait_for_messages(self, count: int, timeout: float) -> bool:
+        """Blocks until `count` messages have been sent or `timeout` expires."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while len(self.sent) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            return self._updates[:limit]
+
+    def _send_message(self, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        chat_id = int(params["chat_id"])
+        now = time.monotonic()
+        with self._cond:
+            if self.flood_limit:
+                while self._recent_sends and now - self._recent_sends[0] > 1.0:
+                    self._recent_sends.popleft()
+                if len(self._recent_sends) >= self.flood_limit:
+                    self.flood_rejections += 1
+                    return 429, {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": f"Too Many Requests: retry after {self.retry_after}",
+                        "parameters": {"retry_after": self.retry_after},
+                    }
+                self._recent_sends.append(now)
+            self.sent.append((now, chat_id))
+            if self._pending.get(chat_id):
+                self.latencies.append(now - self._pending[chat_id].popleft())
+            message_id = len(self.sent)
+            self._cond.notify_all()
+        return 200, {"ok": True, "result": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                method = self.path.rsplit("/", 1)[-1]
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode()
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    params = json.loads(body or "{}")
+                else:
+                    params = {k: v[0] for k, v in parse_qs(body).items()}
+
+                if method == "getMe":
+                    status, reply = 200, {"ok": True, "result": BOT_USER}
+                elif method == "getUpdates":
+                    status, reply = 200, {"ok": True, "result": fake._get_updates(params)}
+                elif method == "sendMessage":
+                    status, reply = fake._send_message(params)
+                else:
+                    status, reply = 200, {"ok": True, "result": True}
+
+                data = json.dumps(reply).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The bot hung up on a long poll while shutting down
+                    pass
+
+            do_GET = do_POST
+
+        return Handler
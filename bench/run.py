@@ -0,0 +1,178 @@
+"""
+Load-test harness for the bot.
+
+Runs the real handlers from main.py against local fakes of the Telegram
+Bot API and data.guldu.uz, so nothing touches production services.
+
+    python -m bench.run --users 5000 --scenario all --latency 0.2
+
+Scenarios:
+  commands       every user sends /today, /tomorrow or /week at once
+  notifications  every user is subscribed to the same 07:00 slot and the slot fires
+
+Reports p50/p95/p99 latency, messages per second, upstream ajax.php
+requests per user and peak RSS. The fakes run in threads of the same
+process, so peak RSS includes them.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List
+from urllib.parse import urljoin
+
+import crawler
+import main
+from config import SEND_RATE, SEND_PER_CHAT_INTERVAL
+import render
+import storage
+import timetable
+from cache import timetable_cache
+from bench.fake_guldu import FakeGulDU
+from bench.fake_telegram import FakeTelegram
+
+SLOT = "07:00"
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return {"p50": value, "p95": value, "p99": value}
+    q = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": q[49], "p95": q[94], "p99": q[98]}
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def seed_users(guldu: FakeGulDU, count: int) -> List[int]:
+    groups = [(fid, group) for fid, names in guldu.groups.items() for group in names]
+    user_ids = list(range(1000, 1000 + count))
+    for i, user_id in enumerate(user_ids):
+        faculty_id, group = groups[i % len(groups)]
+        storage.save_user(user_id, {
+            "user_id": user_id,
+            "faculty": guldu.faculties[faculty_id],
+            "faculty_id": faculty_id,
+            "course": "1",
+            "specialization": "Bench",
+            "group": group,
+            "notify_time": SLOT,
+            "notify_mode": "today",
+        })
+    return user_ids
+
+def reset_state(guldu: FakeGulDU, telegram: FakeTelegram) -> None:
+    timetable_cache.invalidate()
+    render.invalidate()
+    guldu.reset_counts()
+    telegram.reset()
+
+def report(name: str, users: int, latencies: List[float], elapsed: float, telegram: FakeTelegram,
+           guldu: FakeGulDU, completed: bool) -> Dict[str, Any]:
+    return {
+        "scenario": name,
+        "users": users,
+        "completed": completed,
+        "messages": len(telegram.sent),
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_s": round(len(telegram.sent) / elapsed, 1) if elapsed else 0.0,
+        **{f"{k}_ms": round(v * 1000, 1) for k, v in percentiles(latencies).items()},
+        "upstream_requests_per_user": round(guldu.count("/dars/ajax.php") / users, 4),
+        "flood_rejections": telegram.flood_rejections,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+async def command_storm(users: List[int], guldu: FakeGulDU, telegram: FakeTelegram, timeout: float) -> Dict[str, Any]:
+    reset_state(guldu, telegram)
+    started = time.monotonic()
+    for user_id in users:
+        telegram.inject(user_id, random.choice(["/today", "/tomorrow", "/week"]))
+    completed = await asyncio.to_thread(telegram.wait_for_messages, len(users), timeout)
+    elapsed = time.monotonic() - started
+    return report("commands", len(users), list(telegram.latencies), elapsed, telegram, guldu, completed)
+
+async def notification_burst(application, users: List[int], guldu: FakeGulDU, telegram: FakeTelegram,
+                             timeout: float) -> Dict[str, Any]:
+    reset_state(guldu, telegram)
+    started = time.monotonic()
+    application.job_queue.run_once(main.notification_slot_job, 0, data=SLOT)
+    completed = await asyncio.to_thread(telegram.wait_for_messages, len(users), timeout)
+    elapsed = time.monotonic() - started
+    latencies = [sent_at - started for sent_at, _ in telegram.sent]
+    return report("notifications", len(users), latencies, elapsed, telegram, guldu, completed)
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    storage.USERS_DB = os.path.join(workdir, "users.db")
+    storage.USERS_FILE = os.path.join(workdir, "users.json")
+    # Keep post_init away from the real snapshot and metrics port
+    main.SNAPSHOT_FILE = crawler.SNAPSHOT_FILE = os.path.join(workdir, "timetables.snap")
+    main.METRICS_PORT = None
+
+    guldu = FakeGulDU(args.faculties, args.groups, args.latency).start()
+    telegram = FakeTelegram(args.flood_limit, args.retry_after).start()
+    timetable.BASE_URL = guldu.base_url
+    timetable.AJAX_URL = urljoin(guldu.base_url, "ajax.php")
+
+    users = seed_users(guldu, args.users)
+    application = main.build_application(token="123456:bench", base_url=telegram.base_url)
+    await application.initialize()
+    await main.post_init(application)
+    send_queue = application.bot_data["send_queue"]
+    send_queue.rate = args.send_rate
+    send_queue.per_chat_interval = args.per_chat_interval
+    await application.updater.start_polling(poll_interval=0, timeout=1)
+    await application.start()
+
+    results = []
+    try:
+        if args.scenario in ("commands", "all"):
+            results.append(await command_storm(users, guldu, telegram, args.timeout))
+        if args.scenario in ("notifications", "all"):
+            results.append(await notification_burst(application, users, guldu, telegram, args.timeout))
+    finally:
+        await application.updater.stop()
+        await application.stop()
+        await main.post_shutdown(application)
+        await application.shutdown()
+        telegram.stop()
+        guldu.stop()
+    return results
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=["commands", "notifications", "all"], default="all")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--faculties", type=int, default=5)
+    parser.add_argument("--groups", type=int, default=20, help="groups per faculty")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake GulDU response delay in seconds")
+    parser.add_argument("--flood-limit", type=int, default=None, help="fake Bot API sends/s before answering 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--send-rate", type=float, default=SEND_RATE)
+    parser.add_argument("--per-chat-interval", type=float, default=SEND_PER_CHAT_INTERVAL)
+    parser.add_argument("--timeout", type=float, default=600.0, help="max seconds per scenario")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser.parse_args()
+
+def main_cli() -> None:
+    args = parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"== {result['scenario']} ==")
+        for key, value in result.items():
+            if key != "scenario":
+                print(f"  {key:28} {value}")
+
+if __name__ == "__main__":
+    main_cli()
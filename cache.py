@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from changes import day_hashes
+from config import TIMETABLE_CACHE_TTL, TIMETABLE_CACHE_SIZE, STALE_SERVE_AFTER, STALE_MAX_AGE
+from metrics import CACHE_REQUESTS, Gauge
+from shared import SharedStore
+from timetable import UpstreamError, get_timetable
+
+Timetable = Dict[str, List[Dict[str, str]]]
+CacheKey = Tuple[str, str]
+# (faculty_id, group, old timetable or None, new timetable, changed days)
+ChangeListener = Callable[[str, str, Optional[Timetable], Timetable, List[str]], None]
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot(NamedTuple):
+    timetable: Timetable
+    fetched_at: float
+    # True when served from a last-known-good copy because the site is unhealthy
+    stale: bool
+
+
+class TimetableCache:
+    """
+    Process-wide LRU cache of parsed timetables keyed by (faculty_id, group).
+    Concurrent misses for the same key share a single upstream fetch.
+    Expired entries are kept as last-known-good copies: if a refresh fails or
+    takes longer than `stale_serve_after`, the stale copy is served while the
+    refresh carries on in the background.
+
+    With a `shared` store, every stored timetable is copied there and misses
+    are served from it first, so several processes share one crawl.
+    """
+
+    def __init__(self, fetch: Callable[[str, str], Awaitable[Timetable]], ttl: float, max_size: int,
+                 stale_serve_after: float = STALE_SERVE_AFTER, stale_max_age: float = STALE_MAX_AGE,
+                 shared: Optional[SharedStore] = None):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stale_serve_after = stale_serve_after
+        self.stale_max_age = stale_max_age
+        self.shared = shared
+        # key -> (timetable, fetched_at, expires_at, per-day content hashes)
+        self._entries: "OrderedDict[CacheKey, Tuple[Timetable, float, float, Dict[str, str]]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+        self._listeners: List[ChangeListener] = []
+        # key -> day hashes of a rejected implausible result, accepted if seen again
+        self._suspects: Dict[CacheKey, Dict[str, str]] = {}
+        # key -> time of the last refresh that failed since the entry was stored
+        self._failed: Dict[CacheKey, float] = {}
+
+    def peek_snapshot(self, faculty_id: str, group: str) -> Optional[Snapshot]:
+        """
+        Returns whatever copy is cached, fresh or not, without touching the
+        network. Only copies whose last refresh failed are flagged stale; one
+        that has merely outlived its TTL is not.
+        """
+        key = (str(faculty_id), group)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return Snapshot(entry[0], entry[1], key in self._failed)
+
+    async def get(self, faculty_id: str, group: str) -> Timetable:
+        """Returns the cached timetable, fetching it once on a miss. Raises UpstreamError."""
+        return (await self.get_snapshot(faculty_id, group)).timetable
+
+    async def get_snapshot(self, faculty_id: str, group: str) -> Snapshot:
+        """
+        Returns the timetable with its fetch time. Raises UpstreamError only
+        when the site is failing and no usable stale copy exists.
+        """
+        key = (str(faculty_id), group)
+        entry = self._entries.get(key)
+        now = time.time()
+        if entry is not None and now <= entry[2]:
+            CACHE_REQUESTS.inc(cache="timetable", result="hit")
+            self._entries.move_to_end(key)
+            return Snapshot(entry[0], entry[1], False)
+        CACHE_REQUESTS.inc(cache="timetable", result="miss")
+
+        task = self._refresh(key)
+        # Shield so one cancelled caller does not cancel the shared fetch
+        if entry is None or now - entry[1] > self.stale_max_age:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.stale_serve_after)
+        except (asyncio.TimeoutError, UpstreamError):
+            CACHE_REQUESTS.inc(cache="timetable", result="stale")
+            return Snapshot(entry[0], entry[1], True)
+
+    def _refresh(self, key: CacheKey) -> asyncio.Task:
+        """Starts (or joins) the single upstream fetch for a key."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._load_done(key, t))
+        return task
+
+    def _load_done(self, key: CacheKey, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        # Background revalidations may finish with nobody awaiting them
+        if not task.cancelled() and isinstance(task.exception(), UpstreamError) and key in self._entries:
+            self._failed[key] = time.time()
+
+    async def _load(self, key: CacheKey) -> Snapshot:
+        if self.shared is not None:
+            entry = self.shared.load(*key)
+            if entry is not None and time.time() < entry.expires_at:
+                CACHE_REQUESTS.inc(cache="timetable", result="shared")
+                timetable = self._store(key, entry.timetable, entry.fetched_at, entry.expires_at)
+                return Snapshot(timetable, entry.fetched_at, False)
+        timetable = await self._fetch(*key)
+        if not self._plausible(key, timetable):
+            if key in self._entries:
+                # Lets get_snapshot keep serving the previous copy
+                raise UpstreamError(f"Unconfirmed empty or shrunken timetable for group {key[1]}")
+            # An empty result for an uncached group is returned but not pinned
+            return Snapshot(timetable, time.time(), False)
+        # Already checked: a second _plausible call would reject a just-confirmed result
+        timetable = self._commit(key, timetable)
+        return Snapshot(timetable, time.time(), False)
+
+    def add_listener(self, listener: ChangeListener) -> None:
+        """
+        Registers `listener(faculty_id, group, old, new, changed_days)`, called
+        whenever a refreshed timetable differs from the cached one. `old` is
+        None the first time a group is stored.
+        """
+        self._listeners.append(listener)
+
+    def put(self, faculty_id: str, group: str, timetable: Timetable, ttl: Optional[float] = None) -> Timetable:
+        """
+        Stores a timetable snapshot, evicting the least recently used entries.
+        `ttl` overrides the default lifetime, e.g. for crawler snapshots.
+
+        Days whose content hash is unchanged keep their previous lesson list
+        objects, and a fully unchanged timetable keeps its previous dict, so
+        rendered messages stay valid. Returns the timetable actually stored.
+        An implausible timetable (see _plausible) is not stored; the previous
+        copy is returned instead.
+        """
+        key = (str(faculty_id), group)
+        old = self._entries.get(key)
+        if not self._plausible(key, timetable):
+            return old[0] if old is not None else timetable
+        return self._commit(key, timetable, ttl)
+
+    def _commit(self, key: CacheKey, timetable: Timetable, ttl: Optional[float] = None) -> Timetable:
+        """Stores an already checked timetable and copies it to the shared store."""
+        now = time.time()
+        timetable = self._store(key, timetable, now, now + (self.ttl if ttl is None else ttl))
+        if self.shared is not None:
+            entry = self._entries[key]
+            try:
+                self.shared.store(key[0], key[1], timetable, entry[1], entry[2], entry[3])
+            except Exception:
+                # The local copy is stored; other processes fetch it themselves
+                logger.exception(f"Could not write group {key[1]} to the shared store.")
+        return timetable
+
+    def _plausible(self, key: CacheKey, timetable: Timetable) -> bool:
+        """
+        Rejects an empty result, or one in which most of the previously busy
+        days have no lessons left, unless the same result is seen again on the
+        next fetch. Error pages parse to such results and would otherwise push
+        a cancellation for every lesson to every subscriber. An empty result
+        for a group with no cached copy is never pinned.
+        """
+        old = self._entries.get(key)
+        if old is None:
+            # Empty results usually mean an upstream error; don't pin them
+            return bool(timetable)
+        busy = [day for day, lessons in old[0].items() if lessons]
+        kept = sum(1 for day in busy if timetable.get(day))
+        if not busy or (timetable and (len(busy) < 2 or kept * 2 >= len(busy))):
+            self._suspects.pop(key, None)
+            return True
+        hashes = day_hashes(timetable)
+        if self._suspects.get(key) == hashes:
+            del self._suspects[key]
+            return True
+        self._suspects[key] = hashes
+        logger.warning(f"Timetable of group {key[1]} lost {len(busy) - kept}/{len(busy)} days, "
+                       "keeping the previous copy until it is confirmed.")
+        return False
+
+    def _store(self, key: CacheKey, timetable: Timetable, fetched_at: float, expires_at: float) -> Timetable:
+        hashes = day_hashes(timetable)
+        old = self._entries.get(key)
+        changed_days: List[str] = list(hashes) if old is None else []
+        if old is not None:
+            old_timetable, old_hashes = old[0], old[3]
+            changed_days = [day for day in hashes.keys() | old_hashes.keys() if hashes.get(day) != old_hashes.get(day)]
+            if not changed_days:
+                timetable = old_timetable
+            else:
+                timetable = {
+                    day: old_timetable[day] if day not in changed_days else lessons
+                    for day, lessons in timetable.items()
+                }
+
+        self._entries[key] = (timetable, fetched_at, expires_at, hashes)
+        self._entries.move_to_end(key)
+        self._failed.pop(key, None)
+        while len(self._entries) > self.max_size:
+            self._failed.pop(self._entries.popitem(last=False)[0], None)
+
+        if changed_days:
+            for listener in self._listeners:
+                try:
+                    listener(key[0], key[1], old[0] if old is not None else None, timetable, changed_days)
+                except Exception:
+                    logger.exception(f"Timetable change listener failed for group {key[1]}.")
+        return timetable
+
+    def restore(self, faculty_id: str, group: str, timetable: Timetable, fetched_at: float,
+                hashes: Dict[str, str], ttl: Optional[float] = None) -> None:
+        """
+        Loads a previously saved snapshot as-is (no hashing, no listeners).
+        A snapshot older than its lifetime is kept as a stale copy.
+        """
+        key = (str(faculty_id), group)
+        if key in self._entries:
+            return
+        self._entries[key] = (timetable, fetched_at, fetched_at + (self.ttl if ttl is None else ttl), hashes)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def entries(self) -> Iterator[Tuple[str, str, Timetable, float, Dict[str, str]]]:
+        """Yields (faculty_id, group, timetable, fetched_at, day hashes) for every cached snapshot."""
+        for (faculty_id, group), (timetable, fetched_at, _, hashes) in list(self._entries.items()):
+            yield faculty_id, group, timetable, fetched_at, hashes
+
+    def invalidate(self, faculty_id: Optional[str] = None, group: Optional[str] = None) -> None:
+        """Drops one entry, every entry of a faculty, or the whole cache."""
+        if faculty_id is None:
+            self._entries.clear()
+            self._failed.clear()
+            return
+        if group is not None:
+            self._entries.pop((str(faculty_id), group), None)
+            self._failed.pop((str(faculty_id), group), None)
+            return
+        for key in [k for k in self._entries if k[0] == str(faculty_id)]:
+            del self._entries[key]
+            self._failed.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+timetable_cache = TimetableCache(get_timetable, TIMETABLE_CACHE_TTL, TIMETABLE_CACHE_SIZE)
+Gauge("timetable_cache_entries", "Timetables in the shared cache.", lambda: len(timetable_cache))
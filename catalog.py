@@ -0,0 +1,122 @@
+import asyncio
+import difflib
+import logging
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from timetable import get_faculties, get_groups_by_faculty
+
+logger = logging.getLogger(__name__)
+
+_SEPARATORS = re.compile(r"[\s_–—‐-]+")
+
+def normalize_group(text: str) -> str:
+    """Normalizes a group name for matching, e.g. ' 911 – 21 ' -> '911-21'."""
+    return _SEPARATORS.sub("-", text.strip().lower()).strip("-")
+
+
+class GroupCatalog:
+    """
+    Cached list of faculties and their groups with an in-memory index
+    for exact, prefix and fuzzy group lookup.
+    """
+
+    def __init__(self):
+        # faculty name -> faculty id
+        self.faculties: Dict[str, str] = {}
+        # faculty id -> sorted group names
+        self.groups: Dict[str, List[str]] = {}
+        # faculty id -> sorted (normalized name, group name)
+        self._index: Dict[str, List[Tuple[str, str]]] = {}
+        # sorted (normalized name, faculty id, group name) across all faculties
+        self._all_index: List[Tuple[str, str, str]] = []
+        self.refreshed_at: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+
+    async def refresh(self) -> None:
+        """
+        Reloads faculties and groups from the website.
+        Data that could not be fetched keeps its previous value.
+        """
+        async with self._refresh_lock:
+            faculties = await get_faculties()
+            if not faculties:
+                logger.warning("Catalog refresh failed: no faculties returned.")
+                return
+            faculty_ids = list(faculties.values())
+            group_lists = await asyncio.gather(*(get_groups_by_faculty(fid) for fid in faculty_ids))
+
+            self.faculties = faculties
+            for faculty_id, groups in zip(faculty_ids, group_lists):
+                if groups:
+                    self.set_groups(faculty_id, groups)
+            self.refreshed_at = time.time()
+            logger.info(f"Catalog refreshed: {len(faculties)} faculties, {sum(map(len, self.groups.values()))} groups.")
+
+    async def ensure_loaded(self) -> None:
+        """Loads the catalog once if it has never been refreshed."""
+        if not self.faculties:
+            await self.refresh()
+
+    def set_groups(self, faculty_id: str, groups: List[str]) -> None:
+        """Replaces the group list of one faculty and rebuilds its index."""
+        faculty_id = str(faculty_id)
+        self.groups[faculty_id] = sorted(groups)
+        self._index[faculty_id] = sorted((normalize_group(g), g) for g in groups)
+        self._all_index = sorted(
+            (key, fid, group) for fid, index in self._index.items() for key, group in index
+        )
+
+    def pairs(self) -> Iterator[Tuple[str, str]]:
+        """Yields every (faculty_id, group) pair in the catalog."""
+        for faculty_id, groups in self.groups.items():
+            for group in groups:
+                yield faculty_id, group
+
+    def has_groups(self, faculty_id: str) -> bool:
+        return bool(self._index.get(str(faculty_id)))
+
+    def lookup(self, faculty_id: str, text: str) -> Optional[str]:
+        """Returns the canonical group name if `text` matches one exactly (after normalization)."""
+        index = self._index.get(str(faculty_id), [])
+        key = normalize_group(text)
+        i = bisect_left(index, (key, ""))
+        if i < len(index) and index[i][0] == key:
+            return index[i][1]
+        return None
+
+    def complete(self, faculty_id: str, prefix: str, limit: int = 10) -> List[str]:
+        """Returns groups whose normalized name starts with `prefix`."""
+        index = self._index.get(str(faculty_id), [])
+        key = normalize_group(prefix)
+        matches = []
+        for i in range(bisect_left(index, (key, "")), len(index)):
+            if not index[i][0].startswith(key) or len(matches) >= limit:
+                break
+            matches.append(index[i][1])
+        return matches
+
+    def complete_any(self, prefix: str, limit: int = 10) -> List[Tuple[str, str]]:
+        """Returns (faculty_id, group) pairs of any faculty whose normalized name starts with `prefix`."""
+        key = normalize_group(prefix)
+        matches = []
+        for i in range(bisect_left(self._all_index, (key, "", "")), len(self._all_index)):
+            if not self._all_index[i][0].startswith(key) or len(matches) >= limit:
+                break
+            matches.append(self._all_index[i][1:])
+        return matches
+
+    def suggest(self, faculty_id: str, text: str, limit: int = 6) -> List[str]:
+        """Returns likely groups for a mistyped name: prefix matches first, then fuzzy ones."""
+        suggestions = self.complete(faculty_id, text, limit)
+        if len(suggestions) < limit:
+            index = self._index.get(str(faculty_id), [])
+            by_key = dict(index)
+            close = difflib.get_close_matches(normalize_group(text), by_key.keys(), n=limit, cutoff=0.6)
+            suggestions += [by_key[k] for k in close if by_key[k] not in suggestions]
+        return suggestions[:limit]
+
+
+catalog = GroupCatalog()
@@ -0,0 +1,103 @@
+import hashlib
+import json
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+Lesson = Dict[str, str]
+Timetable = Dict[str, List[Lesson]]
+
+# (kind, old lesson, new lesson); kind is one of the constants below
+Change = Tuple[str, Optional[Lesson], Optional[Lesson]]
+
+ADDED = "added"
+REMOVED = "removed"
+MOVED = "moved"
+ROOM = "room"
+LECTURER = "lecturer"
+
+DAY_NAMES_UZ = {
+    "Monday": "Dushanba", "Tuesday": "Seshanba", "Wednesday": "Chorshanba",
+    "Thursday": "Payshanba", "Friday": "Juma", "Saturday": "Shanba", "Sunday": "Yakshanba",
+}
+
+def _lesson_key(lesson: Lesson) -> Tuple[str, str, str, str]:
+    return (lesson["time"], lesson["subject"], lesson["lecturer"], lesson["room"])
+
+def day_hash(lessons: List[Lesson]) -> str:
+    """Structural hash of one day's lessons."""
+    data = json.dumps([_lesson_key(lesson) for lesson in lessons], ensure_ascii=False)
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+def day_hashes(timetable: Timetable) -> Dict[str, str]:
+    return {day: day_hash(lessons) for day, lessons in timetable.items()}
+
+def _take(pool: List[Lesson], match) -> Optional[Lesson]:
+    for i, lesson in enumerate(pool):
+        if match(lesson):
+            return pool.pop(i)
+    return None
+
+def diff_day(old: List[Lesson], new: List[Lesson]) -> List[Change]:
+    """
+    Returns the changes between two versions of a day: room and lecturer
+    changes for the same para and subject, moved lessons (same subject and
+    lecturer in another para), and whatever is left as added or removed.
+    """
+    # Lessons present in both versions are not changes
+    common = Counter(map(_lesson_key, old)) & Counter(map(_lesson_key, new))
+    remaining_old, remaining_new = [], []
+    for lessons, remaining in ((old, remaining_old), (new, remaining_new)):
+        seen = common.copy()
+        for lesson in lessons:
+            if seen[_lesson_key(lesson)] > 0:
+                seen[_lesson_key(lesson)] -= 1
+            else:
+                remaining.append(lesson)
+
+    changes: List[Change] = []
+    unmatched_new = []
+    for lesson in remaining_new:
+        before = _take(remaining_old, lambda o: o["time"] == lesson["time"] and o["subject"] == lesson["subject"])
+        if before is None:
+            unmatched_new.append(lesson)
+            continue
+        if before["room"] != lesson["room"]:
+            changes.append((ROOM, before, lesson))
+        if before["lecturer"] != lesson["lecturer"]:
+            changes.append((LECTURER, before, lesson))
+
+    for lesson in unmatched_new:
+        before = _take(remaining_old, lambda o: o["subject"] == lesson["subject"] and o["lecturer"] == lesson["lecturer"])
+        if before is None:
+            changes.append((ADDED, None, lesson))
+        else:
+            changes.append((MOVED, before, lesson))
+    changes.extend((REMOVED, lesson, None) for lesson in remaining_old)
+    return changes
+
+def diff_timetables(old: Timetable, new: Timetable, days: List[str]) -> Dict[str, List[Change]]:
+    """Diffs the given days; days without changes are left out."""
+    result = {}
+    for day in days:
+        changes = diff_day(old.get(day, []), new.get(day, []))
+        if changes:
+            result[day] = changes
+    return result
+
+def format_changes(group: str, changes_by_day: Dict[str, List[Change]]) -> str:
+    """Builds the compact change notification in Markdown."""
+    lines = [f"🔔 *{group}* guruhi dars jadvalida o'zgarish:"]
+    for day, changes in changes_by_day.items():
+        lines.append(f"\n*{DAY_NAMES_UZ.get(day, day)}*")
+        for kind, old, new in changes:
+            if kind == ADDED:
+                lines.append(f"➕ {new['time']}-para: {new['subject']} ({new['room']})")
+            elif kind == REMOVED:
+                lines.append(f"➖ {old['time']}-para: {old['subject']} bekor qilindi")
+            elif kind == MOVED:
+                lines.append(f"🔀 {new['subject']}: {old['time']}-para → {new['time']}-para ({new['room']})")
+            elif kind == ROOM:
+                lines.append(f"🚪 {new['time']}-para {new['subject']}: {old['room']} → {new['room']}")
+            elif kind == LECTURER:
+                lines.append(f"🧑‍🏫 {new['time']}-para {new['subject']}: {old['lecturer']} → {new['lecturer']}")
+    return "\n".join(lines)
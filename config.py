@@ -7,4 +7,84 @@ BOT_TOKEN = "8296974072:AAFDq-PiM6zYBIDpVL-f6FfaExQ1KgAd9uo"
 TIMETABLE_URL = "https://data.guldu.uz/dars/"
 
 # Default notification settings
-DEFAULT_NOTIFY_MODE = "tomorrow"
\ No newline at end of file
+DEFAULT_NOTIFY_MODE = "tomorrow"
+
+# Upstream HTTP client settings (shared keep-alive pool for data.guldu.uz)
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_KEEPALIVE_EXPIRY = 30.0
+HTTP_CONNECT_TIMEOUT = 5.0
+HTTP_READ_TIMEOUT = 15.0
+
+# Shared timetable cache
+TIMETABLE_CACHE_TTL = 15 * 60  # seconds
+TIMETABLE_CACHE_SIZE = 2000  # max (faculty_id, group) entries
+
+# Outgoing message pacing (Telegram flood limits)
+SEND_RATE = 30  # messages per second across all chats
+SEND_PER_CHAT_INTERVAL = 1.0  # seconds between messages to one chat
+SEND_MAX_RETRIES = 5
+
+# HTML parser backend for timetable pages: "html.parser" or "lxml" (optional)
+TIMETABLE_PARSER = "html.parser"
+
+# Background crawler that prefetches every group's timetable
+CRAWL_INTERVAL = 3 * 60 * 60  # seconds between full crawls
+CRAWL_TIMES = ["06:00", "20:00"]  # extra crawls ahead of the notification peaks
+CRAWL_CONCURRENCY = 8  # parallel upstream requests
+CRAWL_JITTER = 2.0  # max random delay (seconds) before each request
+CRAWL_SNAPSHOT_TTL = 6 * 60 * 60  # how long crawled snapshots are served
+
+# Rendered message cache
+RENDER_CACHE_SIZE = 5000  # max (faculty_id, group, view) entries
+
+# Update delivery: "polling" (default) or "webhook"
+RUN_MODE = "polling"
+CONCURRENT_UPDATES = 64  # updates processed in parallel (one at a time per user)
+
+# Webhook settings, used when RUN_MODE = "webhook".
+# The bot serves plain HTTP on WEBHOOK_LISTEN:WEBHOOK_PORT behind a TLS-terminating
+# reverse proxy, unless WEBHOOK_CERT and WEBHOOK_KEY are set.
+WEBHOOK_LISTEN = "127.0.0.1"
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = "telegram"
+WEBHOOK_URL = ""  # public https URL, e.g. "https://bot.example.com/telegram"
+WEBHOOK_SECRET_TOKEN = ""
+WEBHOOK_CERT = None
+WEBHOOK_KEY = None
+
+# Prometheus metrics endpoint (set METRICS_PORT = None to disable)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9100
+# Sampling profiler; can also be toggled at runtime via /profile/start and /profile/stop
+PROFILER_ENABLED = False
+PROFILER_INTERVAL = 0.01  # seconds between stack samples
+
+# Upstream resilience
+UPSTREAM_DEADLINE = 10.0  # hard limit (seconds) for one upstream request
+BREAKER_FAILURE_THRESHOLD = 5  # consecutive failures that open the circuit
+BREAKER_RESET_TIMEOUT = 30.0  # seconds before a trial request is let through
+STALE_SERVE_AFTER = 2.0  # wait this long for fresh data before serving a stale snapshot
+STALE_MAX_AGE = 7 * 24 * 60 * 60  # oldest snapshot (seconds) still served during outages
+
+# Push a change summary to a group's subscribers when its timetable changes
+CHANGE_NOTIFICATIONS = True
+
+# Compact on-disk snapshot of every crawled timetable, loaded at startup
+SNAPSHOT_FILE = "timetables.snap"
+
+# Multi-process mode: the front process handles updates and crawling, and
+# WORKER_COUNT processes each send the notifications of one shard of groups.
+# 0 keeps everything in a single process.
+WORKER_COUNT = 0
+# SQLite file shared by all processes (timetable cache copy and job leases)
+SHARED_DB = "shared.db"
+SLOT_RESCAN_INTERVAL = 60  # seconds between worker scans for new notification slots
+SLOT_LEASE_TTL = 2 * 60 * 60  # a slot lease blocks duplicate sends for this long
+WORKER_CHECK_INTERVAL = 30  # seconds between front-process checks that respawn dead workers
+
+# Inline mode (@bot 911-21 juma), answered only from cached data
+INLINE_DEBOUNCE = 0.3  # seconds a query waits for the user to stop typing
+INLINE_CACHE_TIME = 300  # seconds Telegram may cache an answer
+INLINE_STALE_CACHE_TIME = 30  # shorter client cache for answers built from stale timetables
+INLINE_MAX_RESULTS = 20  # Telegram allows up to 50
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from telegram.ext import ContextTypes
+
+from config import CRAWL_CONCURRENCY, CRAWL_JITTER, CRAWL_SNAPSHOT_TTL, SNAPSHOT_FILE
+from cache import TimetableCache, timetable_cache
+from catalog import catalog
+from metrics import JOBS
+from snapshot import save_snapshot
+from timetable import UpstreamError, get_timetable
+
+logger = logging.getLogger(__name__)
+
+# Summary of the most recent finished crawl
+last_crawl: Dict[str, Any] = {}
+
+_crawl_lock = asyncio.Lock()
+
+async def crawl_university(cache: TimetableCache = timetable_cache, concurrency: int = CRAWL_CONCURRENCY,
+                           jitter: float = CRAWL_JITTER) -> Optional[Dict[str, Any]]:
+    """
+    Refreshes the group catalog and every group's timetable with a bounded
+    worker pool and stores the results in the cache as timestamped snapshots.
+    Returns None if a crawl is already running.
+    """
+    if _crawl_lock.locked():
+        logger.info("Crawl already in progress, skipping.")
+        return None
+
+    async with _crawl_lock:
+        started = time.time()
+        semaphore = asyncio.Semaphore(concurrency)
+        # The crawl doubles as the periodic catalog refresh
+        await catalog.refresh()
+        pairs = list(catalog.pairs())
+        failed: List[Tuple[str, str]] = []
+
+        async def refresh(faculty_id: str, group: str) -> None:
+            # Spread requests out so the crawl doesn't arrive as one burst
+            await asyncio.sleep(random.uniform(0, jitter))
+            try:
+                async with semaphore:
+                    timetable = await get_timetable(faculty_id, group)
+            except UpstreamError:
+                # Keep the previous snapshot; it stays available as a stale copy
+                failed.append((faculty_id, group))
+                return
+            cache.put(faculty_id, group, timetable, ttl=CRAWL_SNAPSHOT_TTL)
+
+        await asyncio.gather(*(refresh(fid, group) for fid, group in pairs))
+        if cache is timetable_cache:
+            try:
+                await save_snapshot(SNAPSHOT_FILE, cache, catalog)
+            except OSError as e:
+                logger.error(f"Could not save snapshot {SNAPSHOT_FILE}: {e}")
+
+        last_crawl.clear()
+        last_crawl.update({
+            "started_at": started,
+            "finished_at": time.time(),
+            "groups": len(pairs),
+            "failed": len(failed),
+        })
+        logger.info(
+            f"Crawled {len(pairs) - len(failed)}/{len(pairs)} timetables "
+            f"in {last_crawl['finished_at'] - started:.1f}s."
+        )
+        return dict(last_crawl)
+
+async def crawl_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Job callback for the scheduled background crawl."""
+    JOBS.inc(job="crawl")
+    await crawl_university()
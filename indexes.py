@@ -0,0 +1,180 @@
+import asyncio
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+GroupKey = Tuple[str, str]  # (faculty_id, group)
+
+_WORD = re.compile(r"[^\w']+")
+
+
+class Posting(NamedTuple):
+    day: str
+    time: str
+    subject: str
+    lecturer: str
+    room: str
+    faculty_id: str
+    group: str
+
+
+def normalize_name(text: str) -> str:
+    """'  Karimov  A. ' -> 'karimov a'"""
+    return " ".join(_WORD.sub(" ", text.lower()).split())
+
+def normalize_room(text: str) -> str:
+    """'101-xona' -> '101'"""
+    return normalize_name(text.lower().replace("xona", ""))
+
+
+class _InvertedIndex:
+    """
+    Maps a normalized key to its postings, grouped by group so a group's
+    postings can be replaced on refresh. Keys are also indexed by word for
+    prefix search ("karim" finds "karimov a").
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[GroupKey, List[Posting]]] = defaultdict(dict)
+        self.display: Dict[str, str] = {}
+        self._words: Dict[str, Set[str]] = defaultdict(set)
+        self._sorted_words: Optional[List[str]] = None
+
+    def add(self, key: str, display: str, group_key: GroupKey, posting: Posting) -> None:
+        if key not in self.postings:
+            self.display[key] = display
+            for word in key.split():
+                self._words[word].add(key)
+            self._sorted_words = None
+        self.postings[key].setdefault(group_key, []).append(posting)
+
+    def remove_group(self, key: str, group_key: GroupKey) -> None:
+        by_group = self.postings.get(key)
+        if by_group is None:
+            return
+        by_group.pop(group_key, None)
+        if not by_group:
+            del self.postings[key]
+            del self.display[key]
+            for word in key.split():
+                self._words[word].discard(key)
+                if not self._words[word]:
+                    del self._words[word]
+            self._sorted_words = None
+
+    def search(self, query: str, normalize) -> List[str]:
+        """Returns keys matching `query` exactly, or whose words start with every query word."""
+        key = normalize(query)
+        if key in self.postings:
+            return [key]
+        words = key.split()
+        if not words:
+            return []
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self._words)
+        result: Optional[Set[str]] = None
+        for word in words:
+            matches: Set[str] = set()
+            i = bisect_left(self._sorted_words, word)
+            while i < len(self._sorted_words) and self._sorted_words[i].startswith(word):
+                matches |= self._words[self._sorted_words[i]]
+                i += 1
+            result = matches if result is None else result & matches
+            if not result:
+                return []
+        return sorted(result)
+
+    def lookup(self, key: str) -> List[Posting]:
+        return [p for postings in self.postings.get(key, {}).values() for p in postings]
+
+
+class TimetableIndex:
+    """
+    University-wide lecturer, room and room-occupancy indexes, updated one
+    group at a time whenever that group's timetable is stored.
+    """
+
+    def __init__(self):
+        self.lecturers = _InvertedIndex()
+        self.rooms = _InvertedIndex()
+        # (day, para) -> room key -> groups using it
+        self._occupancy: Dict[Tuple[str, str], Dict[str, Set[GroupKey]]] = defaultdict(lambda: defaultdict(set))
+        # group -> (lecturer keys, room keys, occupied slots) it contributed
+        self._contributed: Dict[GroupKey, Tuple[Set[str], Set[str], Set[Tuple[str, str, str]]]] = {}
+
+    def update_group(self, faculty_id: str, group: str, timetable: Optional[Mapping[str, List[Dict[str, str]]]]) -> None:
+        """Replaces everything the group contributed with its new timetable."""
+        group_key = (str(faculty_id), group)
+        lecturer_keys, room_keys, slots = self._contributed.pop(group_key, (set(), set(), set()))
+        for key in lecturer_keys:
+            self.lecturers.remove_group(key, group_key)
+        for key in room_keys:
+            self.rooms.remove_group(key, group_key)
+        for day, para, room in slots:
+            users = self._occupancy[(day, para)][room]
+            users.discard(group_key)
+            if not users:
+                del self._occupancy[(day, para)][room]
+
+        if not timetable:
+            return
+        lecturer_keys, room_keys, slots = set(), set(), set()
+        for day, lessons in timetable.items():
+            for lesson in lessons:
+                posting = Posting(day, lesson["time"], lesson["subject"], lesson["lecturer"], lesson["room"],
+                                  group_key[0], group)
+                if lesson["lecturer"] != "N/A":
+                    key = normalize_name(lesson["lecturer"])
+                    if key:
+                        self.lecturers.add(key, lesson["lecturer"], group_key, posting)
+                        lecturer_keys.add(key)
+                if lesson["room"] != "N/A":
+                    key = normalize_room(lesson["room"])
+                    if key:
+                        self.rooms.add(key, lesson["room"], group_key, posting)
+                        room_keys.add(key)
+                        self._occupancy[(day, lesson["time"])][key].add(group_key)
+                        slots.add((day, lesson["time"], key))
+        self._contributed[group_key] = (lecturer_keys, room_keys, slots)
+
+    async def rebuild(self, entries: Iterable[Tuple[str, str, Mapping, float, Dict[str, str]]],
+                      batch_size: int = 50) -> int:
+        """
+        Indexes (faculty_id, group, timetable, ...) entries, e.g. from
+        TimetableCache.entries(), yielding to the event loop between batches.
+        Groups already indexed by a newer update are skipped. Returns the
+        number of groups indexed.
+        """
+        indexed = 0
+        for faculty_id, group, timetable, *_ in entries:
+            if (str(faculty_id), group) in self._contributed:
+                continue
+            self.update_group(faculty_id, group, timetable)
+            indexed += 1
+            if indexed % batch_size == 0:
+                await asyncio.sleep(0)
+        return indexed
+
+    def find_lecturers(self, query: str) -> List[str]:
+        return self.lecturers.search(query, normalize_name)
+
+    def lecturer_schedule(self, key: str) -> List[Posting]:
+        return self.lecturers.lookup(key)
+
+    def find_rooms(self, query: str) -> List[str]:
+        return self.rooms.search(query, normalize_room)
+
+    def room_schedule(self, key: str) -> List[Posting]:
+        return self.rooms.lookup(key)
+
+    def free_rooms(self, day: str, para: str) -> List[str]:
+        """Known rooms with no lesson in the given day and para."""
+        occupied = self._occupancy.get((day, para), {})
+        return sorted(
+            (self.rooms.display[key] for key in self.rooms.postings if key not in occupied),
+            key=lambda room: (len(room), room),
+        )
+
+
+timetable_index = TimetableIndex()
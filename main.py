@@ -1,20 +1,78 @@
 # c:\Users\Azamat\Documents\telegram bot\main.py
+import asyncio
+import functools
+import hashlib
 import logging
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+import multiprocessing
+import signal
+import threading
+from telegram import (
+    Update,
+    ReplyKeyboardMarkup,
+    ReplyKeyboardRemove,
+    InlineQueryResultArticle,
+    InlineQueryResultsButton,
+    InputTextMessageContent,
+)
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
     CommandHandler,
     ContextTypes,
     ConversationHandler,
+    InlineQueryHandler,
     MessageHandler,
     filters,
 )
 from datetime import time, datetime
+from typing import Optional
 import pytz
 
-from config import BOT_TOKEN, DEFAULT_NOTIFY_MODE
-from storage import get_user, save_user, get_all_users
-from timetable import get_faculties, get_timetable
+from config import (
+    BOT_TOKEN,
+    DEFAULT_NOTIFY_MODE,
+    CRAWL_INTERVAL,
+    CRAWL_TIMES,
+    RUN_MODE,
+    CONCURRENT_UPDATES,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_URL,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_CERT,
+    WEBHOOK_KEY,
+    METRICS_HOST,
+    METRICS_PORT,
+    PROFILER_ENABLED,
+    PROFILER_INTERVAL,
+    CHANGE_NOTIFICATIONS,
+    CRAWL_SNAPSHOT_TTL,
+    SNAPSHOT_FILE,
+    SEND_RATE,
+    WORKER_COUNT,
+    SLOT_RESCAN_INTERVAL,
+    WORKER_CHECK_INTERVAL,
+    SLOT_LEASE_TTL,
+    INLINE_DEBOUNCE,
+    INLINE_CACHE_TIME,
+    INLINE_STALE_CACHE_TIME,
+    INLINE_MAX_RESULTS,
+)
+from storage import get_user, save_user, get_users_by_notify_time, get_users_by_group, get_notify_times
+from scheduler import normalize_slot, schedule_slot, schedule_slots_from_users, group_subscribers
+from sender import SendQueue
+from timetable import DAYS_MAP, UpstreamError, close_client
+from catalog import catalog
+from cache import timetable_cache
+from metrics import JOBS, SamplingProfiler, boot_timer, start_metrics_server, track_handler
+from crawler import crawl_job
+from render import MESSAGE_LIMIT, WEEK, render_day, render_week, render_postings, split_message, stale_note, with_note
+from indexes import timetable_index
+from changes import DAY_NAMES_UZ, diff_timetables, format_changes
+from snapshot import load_snapshot
+from update_processor import PerUserUpdateProcessor
+from shared import shared_store
 
 # Enable logging
 logging.basicConfig(
@@ -22,6 +80,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+UPSTREAM_DOWN_MESSAGE = "Dars jadvali sayti vaqtincha ishlamayapti. Iltimos, birozdan so'ng qayta urinib ko'ring."
+
 # Conversation states for setup
 FACULTY, COURSE, SPECIALIZATION, GROUP, NOTIFY_TIME, CONFIRMATION = range(6)
 
@@ -50,49 +110,42 @@ def get_day_of_week(day: str) -> str:
 async def send_timetable_for_day(chat_id: int, user: dict, day: str, context: ContextTypes.DEFAULT_TYPE):
     """Fetches and sends the timetable for a specific day."""
     if not all(k in user for k in ["faculty_id", "group"]):
-        await context.bot.send_message(chat_id=chat_id, text="Fakultet yoki guruh ma'lumotlari topilmadi. /start orqali qayta sozlang.")
+        await context.bot_data["send_queue"].send(chat_id, "Fakultet yoki guruh ma'lumotlari topilmadi. /start orqali qayta sozlang.")
         return
 
-    full_timetable = get_timetable(user["faculty_id"], user["group"])
-    day_name = get_day_of_week(day)
-
-    if not full_timetable or day_name not in full_timetable:
-        await context.bot.send_message(chat_id=chat_id, text=f"*{day_name}* uchun dars jadvali topilmadi yoki bu kunga darslar yo'q.", parse_mode="Markdown")
+    try:
+        snapshot = await timetable_cache.get_snapshot(user["faculty_id"], user["group"])
+    except UpstreamError:
+        await context.bot_data["send_queue"].send(chat_id, UPSTREAM_DOWN_MESSAGE)
         return
 
-    lessons = full_timetable[day_name]
-    message = f"📅 *{user['group']}* guruhi uchun *{day_name}* dars jadvali:\n\n"
-    for lesson in lessons:
-        message += f" cặp (para): {lesson['time']}\n"
-        message += f"📚 *Fan:* {lesson['subject']}\n"
-        message += f"🧑‍🏫 *O'qituvchi:* {lesson['lecturer']}\n"
-        message += f"🚪 *Xona:* {lesson['room']}\n"
-        message += "--------------------\n"
-    
-    await context.bot.send_message(chat_id=chat_id, text=message, parse_mode="Markdown")
+    chunks = render_day(user["faculty_id"], user["group"], get_day_of_week(day), snapshot.timetable)
+    if snapshot.stale:
+        chunks = with_note(chunks, stale_note(snapshot.fetched_at))
+    for chunk in chunks:
+        await context.bot_data["send_queue"].send(chat_id, chunk, parse_mode="Markdown")
 
 async def send_weekly_timetable(chat_id: int, user: dict, context: ContextTypes.DEFAULT_TYPE):
     """Fetches and sends the timetable for the whole week."""
     if not all(k in user for k in ["faculty_id", "group"]):
-        await context.bot.send_message(chat_id=chat_id, text="Fakultet yoki guruh ma'lumotlari topilmadi. /start orqali qayta sozlang.")
+        await context.bot_data["send_queue"].send(chat_id, "Fakultet yoki guruh ma'lumotlari topilmadi. /start orqali qayta sozlang.")
         return
 
-    full_timetable = get_timetable(user["faculty_id"], user["group"])
-    if not full_timetable:
-        await context.bot.send_message(chat_id=chat_id, text="Haftalik dars jadvali topilmadi.")
+    try:
+        snapshot = await timetable_cache.get_snapshot(user["faculty_id"], user["group"])
+    except UpstreamError:
+        await context.bot_data["send_queue"].send(chat_id, UPSTREAM_DOWN_MESSAGE)
         return
 
-    message = f"📅 *{user['group']}* guruhi uchun haftalik dars jadvali:\n\n"
-    for day_name, lessons in sorted(full_timetable.items(), key=lambda item: ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"].index(item[0])):
-        message += f"--- *{day_name.upper()}* ---\n"
-        for lesson in lessons:
-            message += f" cặp: {lesson['time']}, {lesson['subject']} ({lesson['room']})\n"
-        message += "\n"
-    
-    await context.bot.send_message(chat_id=chat_id, text=message, parse_mode="Markdown")
+    chunks = render_week(user["faculty_id"], user["group"], snapshot.timetable)
+    if snapshot.stale:
+        chunks = with_note(chunks, stale_note(snapshot.fetched_at))
+    for chunk in chunks:
+        await context.bot_data["send_queue"].send(chat_id, chunk, parse_mode="Markdown")
 
 # --- Main Command Handlers ---
 
+@track_handler("start")
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Starts the conversation. Checks if user is already registered."""
     user = get_user(update.message.from_user.id)
@@ -105,6 +158,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             f"Guruh: {user['group']}\n"
             f"Xabar vaqti: {user['notify_time']}\n\n"
             "Jadvalni ko'rish uchun: /today, /tomorrow, /week\n"
+            "O'qituvchi va xonalar: /teacher, /room, /freerooms\n"
             "Sozlamalarni o'zgartirish uchun /start buyrug'ini qayta bosing."
         )
         return ConversationHandler.END
@@ -114,7 +168,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         "Keling, ma'lumotlaringizni birma-bir kiritamiz."
     )
     
-    faculties = get_faculties()
+    await catalog.ensure_loaded()
+    faculties = catalog.faculties
     if not faculties:
         await update.message.reply_text("Xatolik: Fakultetlarni olib bo'lmadi. Iltimos, birozdan so'ng qayta urinib ko'ring.")
         return ConversationHandler.END
@@ -126,6 +181,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await update.message.reply_text("Iltimos, fakultetingizni tanlang 👇", reply_markup=reply_markup)
     return FACULTY
 
+@track_handler("today")
 async def today(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = get_user(update.message.from_user.id)
     if user:
@@ -133,6 +189,7 @@ async def today(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         await update.message.reply_text("Siz ro'yxatdan o'tmagansiz. /start buyrug'ini bosing.")
 
+@track_handler("tomorrow")
 async def tomorrow(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = get_user(update.message.from_user.id)
     if user:
@@ -140,6 +197,7 @@ async def tomorrow(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         await update.message.reply_text("Siz ro'yxatdan o'tmagansiz. /start buyrug'ini bosing.")
 
+@track_handler("week")
 async def week(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = get_user(update.message.from_user.id)
     if user:
@@ -147,13 +205,185 @@ async def week(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         await update.message.reply_text("Siz ro'yxatdan o'tmagansiz. /start buyrug'ini bosing.")
 
+@track_handler("cancel")
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await update.message.reply_text("Jarayon bekor qilindi.", reply_markup=ReplyKeyboardRemove())
     context.user_data.clear()
     return ConversationHandler.END
 
+# --- University-wide Lookups ---
+
+def parse_day(text: str) -> Optional[str]:
+    """Turns 'dushanba', 'monday', 'bugun' or 'ertaga' into an English day name."""
+    text = text.strip().lower()
+    if text in ("bugun", "today"):
+        return get_day_of_week("today")
+    if text in ("ertaga", "tomorrow"):
+        return get_day_of_week("tomorrow")
+    for day_uz, day_en in DAYS_MAP.items():
+        if text in (day_uz.lower(), day_en.lower()):
+            return day_en
+    return None
+
+async def reply_chunks(update: Update, context: ContextTypes.DEFAULT_TYPE, chunks: list) -> None:
+    for chunk in chunks:
+        await context.bot_data["send_queue"].send(update.message.chat_id, chunk, parse_mode="Markdown")
+
+@track_handler("teacher")
+async def teacher(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        await update.message.reply_text("Foydalanish: /teacher <o'qituvchi ismi>, masalan: /teacher Karimov")
+        return
+    matches = timetable_index.find_lecturers(" ".join(context.args))
+    if not matches:
+        await update.message.reply_text("Bunday o'qituvchi topilmadi.")
+        return
+    if len(matches) > 1 and len(matches) <= 10:
+        names = "\n".join(timetable_index.lecturers.display[key] for key in matches)
+        await update.message.reply_text(f"Bir nechta o'qituvchi topildi, aniqroq yozing:\n{names}")
+        return
+    if len(matches) > 10:
+        await update.message.reply_text("Juda ko'p o'qituvchi topildi, aniqroq yozing.")
+        return
+    key = matches[0]
+    title = f"🧑‍🏫 *{timetable_index.lecturers.display[key]}* dars jadvali:"
+    await reply_chunks(update, context, render_postings(title, timetable_index.lecturer_schedule(key), "room"))
+
+@track_handler("room")
+async def room(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        await update.message.reply_text("Foydalanish: /room <xona>, masalan: /room 101")
+        return
+    matches = timetable_index.find_rooms(" ".join(context.args))
+    if len(matches) != 1:
+        if matches and len(matches) <= 20:
+            rooms = ", ".join(timetable_index.rooms.display[key] for key in matches)
+            await update.message.reply_text(f"Bir nechta xona topildi, aniqroq yozing: {rooms}")
+        else:
+            await update.message.reply_text("Bunday xona topilmadi.")
+        return
+    key = matches[0]
+    title = f"🚪 *{timetable_index.rooms.display[key]}* bandligi:"
+    await reply_chunks(update, context, render_postings(title, timetable_index.room_schedule(key), "lecturer"))
+
+@track_handler("freerooms")
+async def freerooms(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    day = parse_day(context.args[0]) if len(context.args) == 2 else None
+    if day is None:
+        await update.message.reply_text("Foydalanish: /freerooms <kun> <para>, masalan: /freerooms dushanba 2 yoki /freerooms ertaga 3")
+        return
+    para = context.args[1]
+    rooms = timetable_index.free_rooms(day, para)
+    if not rooms:
+        await update.message.reply_text(f"{day}, {para}-para uchun bo'sh xona topilmadi.")
+        return
+    text = f"🟢 *{day}*, *{para}-para* bo'sh xonalar ({len(rooms)}):\n\n" + ", ".join(rooms)
+    await reply_chunks(update, context, split_message(text))
+
+# --- Inline Mode ---
+
+INLINE_WEEK_WORDS = ("hafta", "week")
+
+def parse_inline_query(text: str) -> tuple:
+    """Splits '911-21 juma' into the group text and the requested views (days or WEEK)."""
+    words = text.split()
+    if words and words[-1].lower() in INLINE_WEEK_WORDS:
+        return " ".join(words[:-1]), [WEEK]
+    if words and parse_day(words[-1]):
+        return " ".join(words[:-1]), [parse_day(words[-1])]
+    return " ".join(words), [get_day_of_week("today"), get_day_of_week("tomorrow"), WEEK]
+
+def inline_result_id(faculty_id: str, group: str, view: str, page: int) -> str:
+    """Result ids are limited to 64 bytes; longer ones are replaced by a digest."""
+    result_id = f"{faculty_id}:{group}:{view}:{page}"
+    if len(result_id.encode()) > 64:
+        result_id = hashlib.blake2b(result_id.encode(), digest_size=16).hexdigest()
+    return result_id
+
+def build_inline_results(user_id: int, text: str) -> tuple:
+    """
+    Answers an inline query from the group catalog and the cached timetables only.
+    An empty group text means the user's own group. Returns (results, any stale).
+    """
+    group_text, views = parse_inline_query(text)
+    if group_text:
+        groups = catalog.complete_any(group_text, INLINE_MAX_RESULTS)
+    else:
+        user = get_user(user_id)
+        groups = [(str(user["faculty_id"]), user["group"])] if user and "group" in user else []
+
+    results = []
+    any_stale = False
+    for faculty_id, group in groups:
+        snapshot = timetable_cache.peek_snapshot(faculty_id, group)
+        if snapshot is None:
+            continue
+        any_stale |= snapshot.stale
+        for view in views:
+            if view == WEEK:
+                chunks = render_week(faculty_id, group, snapshot.timetable)
+                title, description = f"{group} — Hafta", "Butun haftalik dars jadvali"
+            else:
+                chunks = render_day(faculty_id, group, view, snapshot.timetable)
+                lessons = snapshot.timetable.get(view, [])
+                title = f"{group} — {DAY_NAMES_UZ.get(view, view)}"
+                description = f"{len(lessons)} ta dars" if lessons else "Dars yo'q"
+            note = stale_note(snapshot.fetched_at) if snapshot.stale else ""
+            if len(note) + len(chunks[0]) <= MESSAGE_LIMIT:
+                chunks = [note + chunks[0]] + chunks[1:]
+            # An inline result carries one message, so longer views become one result per part
+            for page, text in enumerate(chunks, 1):
+                results.append(InlineQueryResultArticle(
+                    id=inline_result_id(faculty_id, group, view, page),
+                    title=title if len(chunks) == 1 else f"{title} ({page}/{len(chunks)})",
+                    description=description,
+                    input_message_content=InputTextMessageContent(text, parse_mode="Markdown"),
+                ))
+        if len(results) >= INLINE_MAX_RESULTS:
+            break
+    return results[:INLINE_MAX_RESULTS], any_stale
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Debounces inline queries: Telegram sends one per keystroke, so each query
+    waits INLINE_DEBOUNCE seconds and is only answered if the user has not
+    typed anything since.
+    """
+    latest = context.bot_data.setdefault("inline_latest", {})
+    latest[update.inline_query.from_user.id] = update.inline_query.id
+    context.application.create_task(_debounced_inline_answer(update, context), update=update)
+
+async def _debounced_inline_answer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.inline_query
+    await asyncio.sleep(INLINE_DEBOUNCE)
+    latest = context.bot_data["inline_latest"]
+    if latest.get(query.from_user.id) != query.id:
+        return
+    del latest[query.from_user.id]
+    await answer_inline_query(update, context)
+
+@track_handler("inline")
+async def answer_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.inline_query
+    results, stale = build_inline_results(query.from_user.id, query.query)
+    button = None
+    if not results:
+        button = InlineQueryResultsButton("Guruhingizni sozlang", start_parameter="setup")
+    try:
+        await query.answer(
+            results,
+            # Answers for the user's own group differ per user
+            is_personal=not parse_inline_query(query.query)[0],
+            cache_time=INLINE_STALE_CACHE_TIME if stale or not results else INLINE_CACHE_TIME,
+            button=button,
+        )
+    except TelegramError as e:
+        # Usually the query expired while the user kept typing
+        logger.warning(f"Could not answer inline query {query.query!r}: {e}")
+
 # --- Setup Conversation Handlers ---
 
+@track_handler("setup_faculty")
 async def faculty_step(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     faculty_name = update.message.text
     faculties = context.user_data.get("faculties")
@@ -170,6 +400,7 @@ async def faculty_step(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     await update.message.reply_text("Kursingizni tanlang 👇", reply_markup=reply_markup)
     return COURSE
 
+@track_handler("setup_course")
 async def course_step(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     course_text = update.message.text
     if not course_text.endswith("-kurs"):
@@ -180,13 +411,29 @@ async def course_step(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     await update.message.reply_text("Endi yo'nalishingiz nomini kiriting (masalan, 'Matematika' yoki 'Kompyuter ilmlari'):", reply_markup=ReplyKeyboardRemove())
     return SPECIALIZATION
 
+@track_handler("setup_specialization")
 async def specialization_step(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data["specialization"] = update.message.text
     await update.message.reply_text("Guruhingiz nomini kiriting (masalan, 101-23):")
     return GROUP
 
+@track_handler("setup_group")
 async def group_step(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    context.user_data["group"] = update.message.text
+    faculty_id = context.user_data["faculty_id"]
+    group = update.message.text
+    # Validate against the catalog when the faculty's group list is known
+    if catalog.has_groups(faculty_id):
+        group = catalog.lookup(faculty_id, update.message.text)
+        if group is None:
+            suggestions = catalog.suggest(faculty_id, update.message.text)
+            if suggestions:
+                reply_markup = ReplyKeyboardMarkup(build_menu(suggestions, n_cols=3), one_time_keyboard=True, resize_keyboard=True)
+                await update.message.reply_text("Bunday guruh topilmadi. Quyidagilardan birini tanlang yoki qayta kiriting 👇", reply_markup=reply_markup)
+            else:
+                await update.message.reply_text("Bunday guruh topilmadi. Iltimos, guruh nomini qayta kiriting (masalan, 101-23):")
+            return GROUP
+
+    context.user_data["group"] = group
     await update.message.reply_text(
         "Har kuni soat nechida dars jadvalini yuborishimni xohlaysiz? ⏰\n"
         "Format: HH:MM (masalan: 07:00 yoki 21:30)",
@@ -194,11 +441,11 @@ async def group_step(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     )
     return NOTIFY_TIME
 
+@track_handler("setup_notify_time")
 async def notify_time_step(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     time_text = update.message.text
     try:
-        time.fromisoformat(time_text)
-        context.user_data["notify_time"] = time_text
+        context.user_data["notify_time"] = normalize_slot(time_text)
         
         ud = context.user_data
         await update.message.reply_text(
@@ -216,6 +463,7 @@ async def notify_time_step(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         await update.message.reply_text("Vaqtni noto'g'ri formatda kiritdingiz. Iltimos, HH:MM formatida kiriting (masalan: 08:00).")
         return NOTIFY_TIME
 
+@track_handler("setup_confirmation")
 async def confirmation_step(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if update.message.text == "Qaytadan boshlash 🔁":
         context.user_data.clear()
@@ -239,11 +487,10 @@ async def confirmation_step(update: Update, context: ContextTypes.DEFAULT_TYPE)
     }
     save_user(user_id, user_data)
     
-    user_time = time.fromisoformat(user_data['notify_time'])
-    jobs = context.job_queue.get_jobs_by_name(str(user_id))
-    for job in jobs:
-        job.schedule_removal()
-    context.job_queue.run_daily(daily_timetable_job, user_time, user_id=user_id, name=str(user_id))
+    # The user's previous slot job cleans itself up once it has no subscribers.
+    # In multi-process mode the workers pick up new slots on their next rescan.
+    if not WORKER_COUNT:
+        schedule_slot(context.job_queue, user_data["notify_time"], notification_slot_job)
 
     await update.message.reply_text(
         "Hammasi sozlandi! 🎉\nJadvalni ko'rish uchun /today, /tomorrow, /week buyruqlaridan foydalaning.",
@@ -254,18 +501,153 @@ async def confirmation_step(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 # --- Daily Job ---
 
-async def daily_timetable_job(context: ContextTypes.DEFAULT_TYPE):
-    """Job callback for sending daily timetables."""
-    user_id = context.job.user_id
-    user = get_user(user_id)
-    if user:
-        await send_timetable_for_day(user_id, user, user.get("notify_mode", "tomorrow"), context)
+async def notification_slot_job(context: ContextTypes.DEFAULT_TYPE):
+    """Job callback for one notification minute slot.
+    Fetches and renders each distinct group once, then sends it to every subscriber.
+    A notification worker only handles its own shard of groups, under a lease."""
+    JOBS.inc(job="notify_slot")
+    slot = context.job.data
+    users = get_users_by_notify_time(slot)
+    if not users:
+        context.job.schedule_removal()
+        return
+
+    shard = context.bot_data.get("shard")
+    if shard is not None:
+        today = datetime.now(pytz.timezone('Asia/Tashkent')).date().isoformat()
+        # Taken before sending: a worker that dies mid-slot is not retried (at most once)
+        lease = f"notify:{slot}:{today}:{shard[0]}/{shard[1]}"
+        if not shared_store.acquire_lease(lease, SLOT_LEASE_TTL):
+            logger.info(f"Slot {slot} shard {shard[0]} already sent by another worker, skipping.")
+            return
+
+    buckets = group_subscribers(users, shard)
+    snapshots = await asyncio.gather(
+        *(timetable_cache.get_snapshot(faculty_id, group) for faculty_id, group, _ in buckets),
+        return_exceptions=True,
+    )
+    messages = []
+    for ((faculty_id, group, notify_mode), chat_ids), snapshot in zip(buckets.items(), snapshots):
+        if isinstance(snapshot, UpstreamError):
+            chunks = [UPSTREAM_DOWN_MESSAGE]
+        elif isinstance(snapshot, Exception):
+            # One broken group must not cost every other group its notification
+            logger.error(f"Slot {slot}: could not load group {group}, skipping it.", exc_info=snapshot)
+            continue
+        elif isinstance(snapshot, BaseException):
+            raise snapshot
+        else:
+            chunks = render_day(faculty_id, group, get_day_of_week(notify_mode), snapshot.timetable)
+            if snapshot.stale:
+                chunks = with_note(chunks, stale_note(snapshot.fetched_at))
+        messages.extend((chat_id, chunk) for chat_id in chat_ids for chunk in chunks)
+    await context.bot_data["send_queue"].broadcast(messages, label=f"slot {slot}", parse_mode="Markdown")
+
+# --- Change Notifications ---
+
+def on_timetable_change(application: Application, faculty_id: str, group: str, old: Optional[dict], new: dict, changed_days: list) -> None:
+    """Cache listener: pushes a compact change summary to the group's subscribers."""
+    if old is None:
+        # First time this group is seen, nothing to compare against
+        return
+    changes = diff_timetables(old, new, changed_days)
+    if not changes:
+        return
+    subscribers = [u["user_id"] for u in get_users_by_group(group) if str(u.get("faculty_id")) == faculty_id]
+    if not subscribers:
+        return
+    chunks = split_message(format_changes(group, changes))
+    messages = [(user_id, chunk) for user_id in subscribers for chunk in chunks]
+    application.create_task(
+        application.bot_data["send_queue"].broadcast(messages, label=f"changes {group}", parse_mode="Markdown")
+    )
 
 # --- Main Application Setup ---
 
-def main() -> None:
-    """Start the bot."""
-    application = Application.builder().token(BOT_TOKEN).build()
+async def _schedule_slots(application: Application) -> None:
+    """Registers the notification slot jobs from the user table in the background."""
+    with boot_timer.phase("schedule_slots"):
+        stats = await schedule_slots_from_users(application.job_queue, notification_slot_job)
+    logger.info(f"Scheduled {stats['slots']} notification slots from {stats['users']} users "
+                f"in {boot_timer.phases['schedule_slots'] * 1000:.1f} ms.")
+
+async def _rebuild_indexes() -> None:
+    """Indexes the snapshot's timetables in the background."""
+    with boot_timer.phase("rebuild_indexes"):
+        groups = await timetable_index.rebuild(timetable_cache.entries())
+    logger.info(f"Indexed {groups} timetables in {boot_timer.phases['rebuild_indexes'] * 1000:.1f} ms.")
+
+def _log_task_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Startup task failed.", exc_info=task.exception())
+
+async def post_init(application: Application) -> None:
+    """
+    Loads the timetable snapshot and starts the send queue and the metrics endpoint.
+    Slot jobs and lecturer/room indexes are built in the background so updates
+    are served as soon as polling (or the webhook) starts.
+    """
+    # Serve the last crawl right away instead of scraping on cold start
+    with boot_timer.phase("load_snapshot"):
+        info = load_snapshot(SNAPSHOT_FILE, timetable_cache, catalog, ttl=CRAWL_SNAPSHOT_TTL)
+    if info:
+        logger.info(f"Loaded {info['groups']} timetables from {SNAPSHOT_FILE} in {info['load_ms']:.1f} ms.")
+
+    with boot_timer.phase("send_queue"):
+        # With notification workers, the bot's global send rate is split across every process
+        send_queue = SendQueue(application.bot, rate=SEND_RATE / (WORKER_COUNT + 1))
+        await send_queue.start()
+    application.bot_data["send_queue"] = send_queue
+    if CHANGE_NOTIFICATIONS:
+        timetable_cache.add_listener(functools.partial(on_timetable_change, application))
+
+    # Lecturer/room indexes follow every stored timetable; the listener goes first
+    # so the background rebuild never overwrites a newer timetable
+    timetable_cache.add_listener(lambda faculty_id, group, old, new, days: timetable_index.update_group(faculty_id, group, new))
+    startup_tasks = [asyncio.create_task(_rebuild_indexes())]
+    if WORKER_COUNT:
+        # Crawled timetables reach the workers through the shared store
+        timetable_cache.shared = shared_store
+    else:
+        startup_tasks.append(asyncio.create_task(_schedule_slots(application)))
+    for task in startup_tasks:
+        task.add_done_callback(_log_task_failure)
+    application.bot_data["startup_tasks"] = startup_tasks
+
+    profiler = SamplingProfiler(PROFILER_INTERVAL)
+    if PROFILER_ENABLED:
+        profiler.start(threading.get_ident())
+    application.bot_data["profiler"] = profiler
+    if METRICS_PORT:
+        with boot_timer.phase("metrics_server"):
+            application.bot_data["metrics_server"] = await start_metrics_server(METRICS_HOST, METRICS_PORT, profiler)
+    logger.info(f"Ready to serve updates: {boot_timer.summary()}.")
+
+async def post_shutdown(application: Application) -> None:
+    """Stops the send queue, metrics endpoint and profiler, and releases the pooled upstream HTTP connections."""
+    for task in application.bot_data.get("startup_tasks", []):
+        task.cancel()
+    await application.bot_data["send_queue"].stop()
+    application.bot_data["profiler"].stop()
+    metrics_server = application.bot_data.get("metrics_server")
+    if metrics_server is not None:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+    await close_client()
+
+def build_application(token: str = BOT_TOKEN, base_url: Optional[str] = None) -> Application:
+    """Builds the application with all handlers registered.
+    `base_url` points the bot at a different Bot API server (e.g. the benchmark fake)."""
+    builder = Application.builder().token(token)
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = (
+        builder
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .build()
+    )
 
     setup_conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -286,17 +668,119 @@ def main() -> None:
     application.add_handler(CommandHandler("today", today))
     application.add_handler(CommandHandler("tomorrow", tomorrow))
     application.add_handler(CommandHandler("week", week))
+    application.add_handler(CommandHandler("teacher", teacher))
+    application.add_handler(CommandHandler("room", room))
+    application.add_handler(CommandHandler("freerooms", freerooms))
+    application.add_handler(InlineQueryHandler(inline_query))
+    return application
+
+# --- Notification Workers ---
+
+async def slot_rescan_job(context: ContextTypes.DEFAULT_TYPE):
+    """Worker job: makes sure every notification slot in the user store has a job."""
+    JOBS.inc(job="slot_rescan")
+    for notify_time in get_notify_times():
+        try:
+            schedule_slot(context.job_queue, notify_time, notification_slot_job)
+        except ValueError:
+            logger.error(f"Skipping invalid notification time {notify_time!r}.")
+
+async def _run_worker(shard: int, shards: int) -> None:
+    application = Application.builder().token(BOT_TOKEN).build()
+    application.bot_data["shard"] = (shard, shards)
+    timetable_cache.shared = shared_store
+    load_snapshot(SNAPSHOT_FILE, timetable_cache, catalog, ttl=CRAWL_SNAPSHOT_TTL)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            # Windows: the front process terminates the worker instead
+            pass
+
+    async with application:
+        # The bot's global send rate is split between the workers and the front process
+        send_queue = SendQueue(application.bot, rate=SEND_RATE / (shards + 1))
+        await send_queue.start()
+        application.bot_data["send_queue"] = send_queue
+        application.job_queue.run_repeating(slot_rescan_job, interval=SLOT_RESCAN_INTERVAL, first=1, name="slot-rescan")
+        await application.start()
+        logger.info(f"Notification worker {shard + 1}/{shards} started.")
+        try:
+            await stop.wait()
+        finally:
+            await application.stop()
+            await send_queue.stop()
+            await close_client()
+
+def run_worker(shard: int, shards: int) -> None:
+    """Entry point of a notification worker process: sends the slots of one shard of groups."""
+    asyncio.run(_run_worker(shard, shards))
+
+def spawn_worker(shard: int, shards: int) -> multiprocessing.Process:
+    """Starts the notification worker process of one shard."""
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_worker, args=(shard, shards), name=f"notify-worker-{shard}", daemon=True
+    )
+    process.start()
+    return process
+
+def start_workers(count: int) -> list:
+    """Spawns `count` notification worker processes."""
+    return [spawn_worker(shard, count) for shard in range(count)]
+
+async def worker_check_job(context: ContextTypes.DEFAULT_TYPE):
+    """Front job: respawns notification workers that have died.
+    A slot's lease is taken before it is sent, so a shard whose worker died
+    mid-slot does not resend it: delivery is at most once."""
+    JOBS.inc(job="worker_check")
+    workers = context.job.data
+    for shard, process in enumerate(workers):
+        if process.is_alive():
+            continue
+        logger.error(f"Worker {process.name} exited with code {process.exitcode}, respawning it.")
+        workers[shard] = spawn_worker(shard, len(workers))
+
+def main() -> None:
+    """Start the bot."""
+    with boot_timer.phase("build_application"):
+        application = build_application()
+    workers = start_workers(WORKER_COUNT)
+    if workers:
+        application.job_queue.run_repeating(
+            worker_check_job, interval=WORKER_CHECK_INTERVAL, first=WORKER_CHECK_INTERVAL, data=workers, name="worker-check"
+        )
 
-    # Schedule jobs for existing users on startup
-    for user in get_all_users():
-        if "notify_time" in user and "user_id" in user:
-            try:
-                user_time = time.fromisoformat(user['notify_time'])
-                application.job_queue.run_daily(daily_timetable_job, user_time, user_id=user['user_id'], name=str(user['user_id']))
-            except (ValueError, KeyError):
-                logger.error(f"Could not schedule job for user {user.get('user_id')}.")
+    # Keep every group's timetable prefetched, with extra runs before the notification peaks
+    application.job_queue.run_repeating(crawl_job, interval=CRAWL_INTERVAL, first=10, name="crawl")
+    for crawl_time in CRAWL_TIMES:
+        application.job_queue.run_daily(crawl_job, time.fromisoformat(crawl_time), name="crawl")
 
-    application.run_polling()
+    try:
+        _serve(application)
+    finally:
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join(10)
+
+def _serve(application: Application) -> None:
+    """Runs the front process: webhook or long polling, until interrupted."""
+    if RUN_MODE == "webhook":
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET_TOKEN or None,
+            cert=WEBHOOK_CERT,
+            key=WEBHOOK_KEY,
+            max_connections=CONCURRENT_UPDATES,
+        )
+    else:
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
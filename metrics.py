@@ -0,0 +1,298 @@
+"""
+Lightweight in-process metrics with a Prometheus text-format endpoint
+and an optional sampling profiler.
+"""
+import asyncio
+import functools
+import logging
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import ContextDecorator, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.collect())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """A gauge whose value is read from a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def collect(self) -> List[str]:
+        try:
+            return [f"{self.name} {float(self.callback())}"]
+        except Exception as e:
+            logger.error(f"Could not read gauge {self.name}: {e}")
+            return []
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def time(self, **labels: Any) -> "_Timer":
+        """Context manager (or sync function decorator) that observes the elapsed time."""
+        return _Timer(self, labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        lines = []
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class _Timer(ContextDecorator):
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def _recreate_cm(self) -> "_Timer":
+        # As a decorator, each call gets its own timer so concurrent calls
+        # do not overwrite each other's start time
+        return _Timer(self.histogram, self.labels)
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.histogram.observe(time.perf_counter() - self._started, **self.labels)
+
+
+class BootTimer:
+    """Records how long each startup phase took, in order."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+        BOOT_PHASE_SECONDS.observe(seconds, phase=name)
+
+    def summary(self) -> str:
+        """e.g. "312.4 ms since start (build_application 40.1 ms, load_snapshot 12.0 ms)"."""
+        total = (time.perf_counter() - self.started) * 1000
+        phases = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases.items())
+        return f"{total:.1f} ms since start ({phases})"
+
+
+# --- Hot-path metrics ---
+
+UPSTREAM_SECONDS = Histogram("upstream_request_seconds", "Upstream HTTP fetch time.", ["endpoint"])
+UPSTREAM_ERRORS = Counter("upstream_errors_total", "Failed upstream requests.", ["endpoint"])
+PARSE_SECONDS = Histogram("parse_seconds", "HTML parse time.", ["page"])
+STORAGE_SECONDS = Histogram("storage_seconds", "User storage operation time.", ["op"])
+RENDER_SECONDS = Histogram("render_seconds", "Message render time (cache misses only).", ["view"])
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups.", ["cache", "result"])
+SEND_SECONDS = Histogram("send_message_seconds", "Bot API sendMessage call time.")
+SEND_RETRIES = Counter("send_retries_total", "Retried sends.", ["reason"])
+SEND_FAILURES = Counter("send_failures_total", "Messages given up on.")
+JOBS = Counter("scheduled_jobs_total", "Scheduled job runs.", ["job"])
+HANDLER_SECONDS = Histogram("handler_seconds", "Update handler latency.", ["command"])
+BOOT_PHASE_SECONDS = Histogram("boot_phase_seconds", "Startup phase duration.", ["phase"])
+
+boot_timer = BootTimer()
+
+
+def track_handler(command: str) -> Callable:
+    """Decorator recording an async handler's latency tagged by command."""
+    def decorator(func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                HANDLER_SECONDS.observe(time.perf_counter() - started, command=command)
+        return wrapper
+    return decorator
+
+
+def render_metrics() -> str:
+    """Returns every registered metric in Prometheus text format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# --- Sampling profiler ---
+
+class SamplingProfiler:
+    """
+    Periodically samples the event loop thread's stack from a background
+    thread and counts folded stacks (flamegraph.pl / speedscope format).
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: "_Tally[str]" = _Tally()
+        self._target = threading.main_thread().ident
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, target_thread: Optional[int] = None) -> None:
+        if self.running:
+            return
+        if target_thread is not None:
+            self._target = target_thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+# --- HTTP endpoint ---
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                  profiler: SamplingProfiler) -> None:
+    try:
+        request_line = (await reader.readline()).decode(errors="replace").split()
+        # Drain the headers
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        path = request_line[1] if len(request_line) > 1 else "/"
+        status, body = "200 OK", ""
+        if path == "/metrics":
+            body = render_metrics()
+        elif path == "/profile":
+            body = profiler.folded()
+        elif path == "/profile/start":
+            profiler.start(threading.get_ident())
+            body = "profiler started\n"
+        elif path == "/profile/stop":
+            profiler.stop()
+            body = "profiler stopped\n"
+        else:
+            status, body = "404 Not Found", "not found\n"
+        data = body.encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data
+        )
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int, profiler: SamplingProfiler) -> asyncio.AbstractServer:
+    """Serves /metrics and the /profile endpoints on host:port."""
+    server = await asyncio.start_server(lambda r, w: _handle(r, w, profiler), host, port)
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,141 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import pytz
+
+from config import RENDER_CACHE_SIZE
+from metrics import CACHE_REQUESTS, RENDER_SECONDS
+
+# Telegram's limit for a single text message
+MESSAGE_LIMIT = 4096
+
+DAY_ORDER = {day: i for i, day in enumerate(
+    ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+)}
+
+# Name of the weekly view in the render cache
+WEEK = "week"
+
+# (faculty_id, group, day name or WEEK) -> (data it was rendered from, message chunks).
+# Days are keyed on their lesson list, so unchanged days survive a timetable refresh.
+_rendered: "OrderedDict[Tuple[str, str, str], Tuple[object, List[str]]]" = OrderedDict()
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Splits text into chunks of at most `limit` characters on line boundaries."""
+    if len(text) <= limit:
+        return [text]
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in text.splitlines(keepends=True):
+        # A single overlong line is cut hard
+        while len(line) > limit:
+            if current:
+                chunks.append(''.join(current))
+                current, size = [], 0
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if size + len(line) > limit:
+            chunks.append(''.join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current:
+        chunks.append(''.join(current))
+    return chunks
+
+def _format_day(group: str, day_name: str, full_timetable: dict) -> str:
+    if not full_timetable or day_name not in full_timetable:
+        return f"*{day_name}* uchun dars jadvali topilmadi yoki bu kunga darslar yo'q."
+
+    parts = [f"📅 *{group}* guruhi uchun *{day_name}* dars jadvali:\n\n"]
+    for lesson in full_timetable[day_name]:
+        parts.append(
+            f" cặp (para): {lesson['time']}\n"
+            f"📚 *Fan:* {lesson['subject']}\n"
+            f"🧑‍🏫 *O'qituvchi:* {lesson['lecturer']}\n"
+            f"🚪 *Xona:* {lesson['room']}\n"
+            "--------------------\n"
+        )
+    return ''.join(parts)
+
+def _format_week(group: str, full_timetable: dict) -> str:
+    if not full_timetable:
+        return "Haftalik dars jadvali topilmadi."
+
+    parts = [f"📅 *{group}* guruhi uchun haftalik dars jadvali:\n\n"]
+    for day_name in sorted(full_timetable, key=lambda day: DAY_ORDER.get(day, len(DAY_ORDER))):
+        parts.append(f"--- *{day_name.upper()}* ---\n")
+        for lesson in full_timetable[day_name]:
+            parts.append(f" cặp: {lesson['time']}, {lesson['subject']} ({lesson['room']})\n")
+        parts.append("\n")
+    return ''.join(parts)
+
+def _cached(key: Tuple[str, str, str], source: object, build) -> List[str]:
+    entry = _rendered.get(key)
+    # A new source object means the data changed, so render again
+    if entry is not None and entry[0] is source:
+        CACHE_REQUESTS.inc(cache="render", result="hit")
+        _rendered.move_to_end(key)
+        return entry[1]
+
+    CACHE_REQUESTS.inc(cache="render", result="miss")
+    with RENDER_SECONDS.time(view="week" if key[2] == WEEK else "day"):
+        chunks = split_message(build())
+    _rendered[key] = (source, chunks)
+    _rendered.move_to_end(key)
+    while len(_rendered) > RENDER_CACHE_SIZE:
+        _rendered.popitem(last=False)
+    return chunks
+
+def render_day(faculty_id: str, group: str, day_name: str, full_timetable: dict) -> List[str]:
+    """Returns the Markdown message chunks for one day, rendered once per version of that day."""
+    lessons = full_timetable.get(day_name) if full_timetable else None
+    return _cached((str(faculty_id), group, day_name), lessons,
+                   lambda: _format_day(group, day_name, full_timetable))
+
+def render_week(faculty_id: str, group: str, full_timetable: dict) -> List[str]:
+    """Returns the Markdown message chunks for the weekly view."""
+    return _cached((str(faculty_id), group, WEEK), full_timetable,
+                   lambda: _format_week(group, full_timetable))
+
+def invalidate(faculty_id: Optional[str] = None, group: Optional[str] = None) -> None:
+    """Drops rendered messages of one group, one faculty, or everything."""
+    if faculty_id is None:
+        _rendered.clear()
+        return
+    for key in [k for k in _rendered if k[0] == str(faculty_id) and (group is None or k[1] == group)]:
+        del _rendered[key]
+
+def stale_note(fetched_at: float) -> str:
+    """Warning shown above timetables served from a last-known-good copy."""
+    as_of = datetime.fromtimestamp(fetched_at, pytz.timezone('Asia/Tashkent')).strftime('%d.%m %H:%M')
+    return f"⚠️ Sayt vaqtincha ishlamayapti. Ma'lumotlar {as_of} holatiga ko'ra.\n\n"
+
+def with_note(chunks: List[str], note: str) -> List[str]:
+    """Prepends a note to the first chunk, or sends it separately if that would exceed the limit."""
+    if len(note) + len(chunks[0]) <= MESSAGE_LIMIT:
+        return [note + chunks[0]] + chunks[1:]
+    return [note] + chunks
+
+def _para_order(para: str) -> Tuple[int, str]:
+    return (int(para), para) if para.isdigit() else (len(DAY_ORDER), para)
+
+def render_postings(title: str, postings: list, detail: str) -> List[str]:
+    """
+    Renders index lookup results grouped by day. `detail` is the lesson
+    field shown next to each group ("room" or "lecturer").
+    """
+    if not postings:
+        return [f"{title}\n\nDarslar topilmadi."]
+    parts = [f"{title}\n"]
+    current_day = None
+    ordered = sorted(postings, key=lambda p: (DAY_ORDER.get(p.day, len(DAY_ORDER)), _para_order(p.time), p.group))
+    for posting in ordered:
+        if posting.day != current_day:
+            current_day = posting.day
+            parts.append(f"\n*{current_day}*\n")
+        parts.append(f" {posting.time}-para: {posting.subject} — {posting.group} ({getattr(posting, detail)})\n")
+    return split_message(''.join(parts))
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import zlib
+from collections import defaultdict
+from datetime import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from telegram.ext import JobQueue
+
+from config import DEFAULT_NOTIFY_MODE
+from storage import iter_users, normalize_notify_time
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the per-slot job names, e.g. "notify:07:00"
+SLOT_JOB_PREFIX = "notify:"
+
+# (faculty_id, group, notify_mode)
+BucketKey = Tuple[str, str, str]
+
+def normalize_slot(notify_time: str) -> str:
+    """Normalizes a user-entered time to its HH:MM minute slot."""
+    return normalize_notify_time(notify_time)
+
+def schedule_slot(job_queue: JobQueue, notify_time: str, callback: Callable) -> None:
+    """
+    Makes sure exactly one daily job exists for the given minute slot.
+    The job receives the slot as `context.job.data`.
+    """
+    slot = normalize_slot(notify_time)
+    name = SLOT_JOB_PREFIX + slot
+    if job_queue.get_jobs_by_name(name):
+        return
+    job_queue.run_daily(callback, time.fromisoformat(slot), name=name, data=slot)
+
+async def schedule_slots_from_users(job_queue: JobQueue, callback: Callable,
+                                    batch_size: int = 500) -> Dict[str, Any]:
+    """
+    Streams user records in batches and registers one job per distinct slot,
+    yielding to the event loop between batches so updates are served meanwhile.
+    Only the set of seen slots is kept in memory. Returns scan stats.
+    """
+    slots: Set[str] = set()
+    users = 0
+    invalid: List[int] = []
+    for user_id, user in iter_users(batch_size):
+        users += 1
+        if user is None:
+            invalid.append(user_id)
+        elif user.get("notify_time"):
+            try:
+                slot = normalize_slot(user["notify_time"])
+            except (TypeError, ValueError):
+                invalid.append(user_id)
+            else:
+                if slot not in slots:
+                    slots.add(slot)
+                    schedule_slot(job_queue, slot, callback)
+        if users % batch_size == 0:
+            await asyncio.sleep(0)
+
+    if invalid:
+        shown = ", ".join(map(str, invalid[:10]))
+        logger.error(f"Skipped {len(invalid)} users with corrupt data or notify_time (e.g. {shown}).")
+    return {"users": users, "slots": len(slots), "invalid": len(invalid)}
+
+def shard_of(faculty_id: str, group: str, shards: int) -> int:
+    """Stable (cross-process) shard number of a group."""
+    return zlib.crc32(f"{faculty_id}:{group}".encode()) % shards
+
+def group_subscribers(users: Iterable[Dict[str, Any]],
+                      shard: Optional[Tuple[int, int]] = None) -> Dict[BucketKey, List[int]]:
+    """
+    Buckets subscribers of one slot by (faculty_id, group, notify_mode)
+    so each distinct timetable is fetched and rendered once.
+    With `shard=(index, shards)` only groups of that shard are kept.
+    """
+    buckets: Dict[BucketKey, List[int]] = defaultdict(list)
+    for user in users:
+        if not all(k in user for k in ["user_id", "faculty_id", "group"]):
+            continue
+        if shard is not None and shard_of(str(user["faculty_id"]), user["group"], shard[1]) != shard[0]:
+            continue
+        key = (str(user["faculty_id"]), user["group"], user.get("notify_mode", DEFAULT_NOTIFY_MODE))
+        buckets[key].append(user["user_id"])
+    return buckets
@@ -0,0 +1,191 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+from weakref import WeakSet
+
+from telegram import Bot, Message
+from telegram.error import BadRequest, NetworkError, RetryAfter, TelegramError
+
+from config import SEND_RATE, SEND_PER_CHAT_INTERVAL, SEND_MAX_RETRIES
+from metrics import SEND_SECONDS, SEND_RETRIES, SEND_FAILURES, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first
+INTERACTIVE = 0
+BULK = 1
+
+# Every live queue, for the depth gauge
+_queues: "WeakSet[SendQueue]" = WeakSet()
+
+
+@dataclass
+class _OutgoingMessage:
+    chat_id: int
+    text: str
+    kwargs: Dict[str, Any]
+    future: asyncio.Future
+    # Queue order within a priority, kept across retries so multi-part messages stay in order
+    seq: int = 0
+    attempts: int = 0
+
+
+class SendQueue:
+    """
+    Paces outgoing messages with a global token bucket and per-chat spacing.
+    Interactive replies jump ahead of bulk notifications, and RetryAfter or
+    transient network errors are retried with backoff.
+    """
+
+    def __init__(self, bot: Bot, rate: float = SEND_RATE, per_chat_interval: float = SEND_PER_CHAT_INTERVAL,
+                 max_retries: int = SEND_MAX_RETRIES):
+        self.bot = bot
+        self.rate = rate
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self._queue: "asyncio.PriorityQueue[Tuple[int, int, _OutgoingMessage]]" = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._tokens = float(rate)
+        self._refilled_at = time.monotonic()
+        self._chat_ready_at: Dict[int, float] = {}
+        self._paused_until = 0.0
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._deliveries: Set[asyncio.Task] = set()
+        _queues.add(self)
+
+    @property
+    def depth(self) -> int:
+        """Number of messages waiting to be sent."""
+        return self._queue.qsize()
+
+    async def start(self) -> None:
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, *self._deliveries, return_exceptions=True)
+            self._dispatcher = None
+
+    def submit(self, chat_id: int, text: str, priority: int = INTERACTIVE, **kwargs: Any) -> asyncio.Future:
+        """Queues a message and returns a future resolving to the sent Message."""
+        item = _OutgoingMessage(chat_id, text, kwargs, asyncio.get_running_loop().create_future(), next(self._seq))
+        self._put(priority, item)
+        return item.future
+
+    async def send(self, chat_id: int, text: str, priority: int = INTERACTIVE, **kwargs: Any) -> Message:
+        """Queues a message and waits until it has been delivered."""
+        return await self.submit(chat_id, text, priority, **kwargs)
+
+    async def broadcast(self, messages: Iterable[Tuple[int, str]], label: str = "broadcast",
+                        **kwargs: Any) -> Dict[str, Any]:
+        """
+        Sends (chat_id, text) pairs as bulk traffic and waits for all of them.
+        Returns delivery stats including the queue depth and drain time.
+        """
+        started = time.monotonic()
+        futures = [self.submit(chat_id, text, BULK, **kwargs) for chat_id, text in messages]
+        depth = self.depth
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        failed = sum(1 for r in results if isinstance(r, BaseException))
+        stats = {
+            "label": label,
+            "messages": len(futures),
+            "sent": len(futures) - failed,
+            "failed": failed,
+            "queue_depth": depth,
+            "drain_time": time.monotonic() - started,
+        }
+        logger.info(
+            f"{label}: sent {stats['sent']}/{stats['messages']} (queue depth {depth}) "
+            f"in {stats['drain_time']:.2f}s"
+        )
+        return stats
+
+    def _put(self, priority: int, item: _OutgoingMessage, delay: float = 0.0) -> None:
+        entry = (priority, item.seq, item)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, entry)
+        else:
+            self._queue.put_nowait(entry)
+
+    async def _acquire_token(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def _dispatch(self) -> None:
+        while True:
+            priority, _, item = await self._queue.get()
+            if item.future.done():
+                continue
+            now = time.monotonic()
+            ready_at = max(self._chat_ready_at.get(item.chat_id, 0.0), self._paused_until)
+            if ready_at > now:
+                self._put(priority, item, ready_at - now)
+                continue
+
+            await self._acquire_token()
+            self._chat_ready_at[item.chat_id] = time.monotonic() + self.per_chat_interval
+            if len(self._chat_ready_at) > 10000:
+                self._forget_idle_chats()
+            task = asyncio.create_task(self._deliver(priority, item))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    def _forget_idle_chats(self) -> None:
+        now = time.monotonic()
+        self._chat_ready_at = {chat: t for chat, t in self._chat_ready_at.items() if t > now}
+
+    async def _deliver(self, priority: int, item: _OutgoingMessage) -> None:
+        item.attempts += 1
+        try:
+            with SEND_SECONDS.time():
+                message = await self.bot.send_message(chat_id=item.chat_id, text=item.text, **item.kwargs)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            # Flood control applies to the whole bot, so pause every chat
+            self._paused_until = max(self._paused_until, time.monotonic() + float(retry_after))
+            logger.warning(f"Flood control hit, pausing sends for {retry_after}s.")
+            SEND_RETRIES.inc(reason="flood")
+            self._retry(priority, item, e, float(retry_after))
+        except BadRequest as e:
+            self._fail(item, e)
+        except NetworkError as e:
+            SEND_RETRIES.inc(reason="network")
+            self._retry(priority, item, e, min(2 ** item.attempts, 30))
+        except TelegramError as e:
+            self._fail(item, e)
+        except Exception as e:
+            # Never leave a sender waiting on an unresolved future
+            self._fail(item, e)
+        else:
+            if not item.future.done():
+                item.future.set_result(message)
+
+    def _retry(self, priority: int, item: _OutgoingMessage, error: Exception, delay: float) -> None:
+        if item.attempts > self.max_retries:
+            self._fail(item, error)
+            return
+        self._put(priority, item, delay)
+
+    def _fail(self, item: _OutgoingMessage, error: Exception) -> None:
+        logger.error(f"Could not send message to {item.chat_id}: {error}")
+        SEND_FAILURES.inc()
+        if not item.future.done():
+            item.future.set_exception(error)
+
+
+Gauge("send_queue_depth", "Messages waiting in the send queue.", lambda: sum(queue.depth for queue in list(_queues)))
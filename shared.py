@@ -0,0 +1,123 @@
+"""
+State shared between the front process and the notification workers,
+kept in one local SQLite file: a write-through copy of the timetable
+cache and named leases that let exactly one process run a given job.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Mapping, NamedTuple, Optional
+
+from config import SHARED_DB
+from metrics import STORAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process as a lease holder
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS timetables (
+    faculty_id TEXT NOT NULL,
+    "group" TEXT NOT NULL,
+    data TEXT NOT NULL,
+    hashes TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (faculty_id, "group")
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SharedEntry(NamedTuple):
+    timetable: Dict[str, List[Dict[str, str]]]
+    fetched_at: float
+    expires_at: float
+    hashes: Dict[str, str]
+
+
+class SharedStore:
+    """Opens the shared database lazily, once per process."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    conn.execute("PRAGMA busy_timeout=5000")
+                    conn.executescript(_SCHEMA)
+                    self._conn = conn
+        return self._conn
+
+    @STORAGE_SECONDS.time(op="shared_load")
+    def load(self, faculty_id: str, group: str) -> Optional[SharedEntry]:
+        """Returns the timetable another process stored for this group, if any."""
+        with self._lock:
+            row = self._get_conn().execute(
+                'SELECT data, fetched_at, expires_at, hashes FROM timetables WHERE faculty_id = ? AND "group" = ?',
+                (str(faculty_id), group),
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return SharedEntry(json.loads(row[0]), row[1], row[2], json.loads(row[3]))
+        except ValueError:
+            logger.error(f"Corrupt shared timetable for group {group}, ignoring it.")
+            return None
+
+    @STORAGE_SECONDS.time(op="shared_store")
+    def store(self, faculty_id: str, group: str, timetable: Mapping[str, List[Dict[str, str]]],
+              fetched_at: float, expires_at: float, hashes: Dict[str, str]) -> None:
+        # Timetables restored from the snapshot are lazy Mapping views, not dicts
+        data = {day: list(lessons) for day, lessons in timetable.items()}
+        with self._lock:
+            self._get_conn().execute(
+                'INSERT OR REPLACE INTO timetables (faculty_id, "group", data, hashes, fetched_at, expires_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (str(faculty_id), group, json.dumps(data), json.dumps(hashes), fetched_at, expires_at),
+            )
+
+    @STORAGE_SECONDS.time(op="acquire_lease")
+    def acquire_lease(self, name: str, ttl: float, owner: str = OWNER) -> bool:
+        """
+        Takes the named lease for `ttl` seconds. Returns False while another
+        owner holds an unexpired lease with the same name.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+                row = conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+                if row is not None and row[0] != owner:
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute(
+                    "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                    (name, owner, now + ttl),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+
+shared_store = SharedStore(SHARED_DB)
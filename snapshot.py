@@ -0,0 +1,186 @@
+"""
+Compact on-disk snapshot of the whole university timetable.
+
+Layout:
+    b"GTT1" | header length (uint32 LE) | header JSON | padding | lesson records
+
+The header holds an interned string table (every distinct para, subject,
+lecturer and room appears once), the faculty/group catalog and, per group,
+its fetch time, day hashes and the record range of each day. Lesson records
+are four uint32 string indexes (time, subject, lecturer, room), aligned so
+the record area can be memory-mapped and read in place.
+"""
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from cache import TimetableCache
+from catalog import GroupCatalog
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GTT1"
+FIELDS = ("time", "subject", "lecturer", "room")
+RECORD_SIZE = len(FIELDS)
+
+# Open maps must stay alive as long as views read from them
+_maps: List[mmap.mmap] = []
+
+
+class TimetableView(Mapping):
+    """
+    Read-only, dict-shaped view of one group's timetable inside a snapshot.
+    A day's lesson dicts are built on first access and then reused.
+    """
+
+    __slots__ = ("_strings", "_records", "_days", "_built")
+
+    def __init__(self, strings: Sequence[str], records: Sequence[int], days: Dict[str, range]):
+        self._strings = strings
+        self._records = records
+        # day name -> range of record numbers
+        self._days = days
+        self._built: Dict[str, List[Dict[str, str]]] = {}
+
+    def __getitem__(self, day: str) -> List[Dict[str, str]]:
+        lessons = self._built.get(day)
+        if lessons is None:
+            strings, records = self._strings, self._records
+            lessons = []
+            for n in self._days[day]:
+                base = n * RECORD_SIZE
+                lessons.append({field: strings[records[base + i]] for i, field in enumerate(FIELDS)})
+            self._built[day] = lessons
+        return lessons
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._days)
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    def __repr__(self) -> str:
+        return f"TimetableView({dict(self)!r})"
+
+
+async def save_snapshot(path: str, cache: TimetableCache, catalog: GroupCatalog) -> int:
+    """
+    Writes every cached timetable and the catalog to `path` atomically.
+    The entries are collected on the event loop; packing and writing run
+    in a worker thread. Returns the group count.
+    """
+    entries = list(cache.entries())
+    return await asyncio.to_thread(_write_snapshot, path, entries, dict(catalog.faculties), dict(catalog.groups))
+
+
+def _write_snapshot(path: str, entries: List[Tuple[str, str, Any, float, Dict[str, str]]],
+                    faculties: Dict[str, str], catalog_groups: Dict[str, List[str]]) -> int:
+    strings: List[str] = []
+    index: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        i = index.get(value)
+        if i is None:
+            i = index[value] = len(strings)
+            strings.append(value)
+        return i
+
+    records = array("I")
+    groups = []
+    for faculty_id, group, timetable, fetched_at, hashes in entries:
+        days = []
+        for day, lessons in timetable.items():
+            days.append([day, len(records) // RECORD_SIZE, len(lessons)])
+            for lesson in lessons:
+                records.extend(intern(lesson[field]) for field in FIELDS)
+        groups.append([faculty_id, group, fetched_at, hashes, days])
+
+    header = json.dumps({
+        "created_at": time.time(),
+        "byteorder": sys.byteorder,
+        "strings": strings,
+        "faculties": faculties,
+        "catalog": catalog_groups,
+        "groups": groups,
+    }, ensure_ascii=False).encode()
+    offset = len(MAGIC) + 4 + len(header)
+    padding = b"\0" * (-offset % records.itemsize)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(padding)
+        records.tofile(f)
+    os.replace(tmp_path, path)
+    return len(groups)
+
+
+def _read_records(path: str, offset: int, byteorder: str) -> Sequence[int]:
+    """Maps the record area read-only, or reads it into an array where that is not possible."""
+    if byteorder == sys.byteorder and os.name != "nt":
+        # Windows would lock the mapped file against the next os.replace
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _maps.append(mapped)
+        return memoryview(mapped)[offset:].cast("I")
+
+    records = array("I")
+    with open(path, "rb") as f:
+        f.seek(offset)
+        records.frombytes(f.read())
+    if byteorder != sys.byteorder:
+        records.byteswap()
+    return records
+
+
+def load_snapshot(path: str, cache: TimetableCache, catalog: GroupCatalog,
+                  ttl: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Loads a snapshot into the cache (as lazy views) and the catalog.
+    Returns summary info, or None if there is no usable snapshot.
+    """
+    started = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                logger.error(f"{path} is not a timetable snapshot, ignoring it.")
+                return None
+            (header_length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_length))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error) as e:
+        logger.error(f"Could not read snapshot {path}: {e}")
+        return None
+
+    offset = len(MAGIC) + 4 + header_length
+    offset += -offset % array("I").itemsize
+    records = _read_records(path, offset, header["byteorder"])
+    strings = [sys.intern(s) for s in header["strings"]]
+
+    for faculty_id, group, fetched_at, hashes, days in header["groups"]:
+        view = TimetableView(strings, records, {day: range(start, start + count) for day, start, count in days})
+        cache.restore(faculty_id, group, view, fetched_at, hashes, ttl)
+
+    if header["faculties"] and not catalog.faculties:
+        catalog.faculties = header["faculties"]
+        for faculty_id, groups in header["catalog"].items():
+            catalog.set_groups(faculty_id, groups)
+        catalog.refreshed_at = header["created_at"]
+
+    return {
+        "groups": len(header["groups"]),
+        "strings": len(strings),
+        "created_at": header["created_at"],
+        "load_ms": (time.perf_counter() - started) * 1000,
+    }
@@ -1,43 +1,197 @@
 # c:\Users\Azamat\Documents\telegram bot\storage.py
 import json
-from typing import Dict, List, Optional, Any
+import logging
+import os
+import sqlite3
+import threading
+from datetime import time
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+
+from metrics import STORAGE_SECONDS
 
 USERS_FILE = "users.json"
+USERS_DB = "users.db"
 
-def get_user(user_id: int) -> Optional[Dict[str, Any]]:
-    """Retrieves a user's data from the JSON file."""
+logger = logging.getLogger(__name__)
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.RLock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    "group" TEXT,
+    notify_time TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_group ON users ("group");
+CREATE INDEX IF NOT EXISTS idx_users_notify_time ON users (notify_time);
+"""
+
+def _get_conn() -> sqlite3.Connection:
+    """Opens the database once, creating the schema and migrating users.json."""
+    global _conn
+    if _conn is None:
+        with _lock:
+            if _conn is None:
+                conn = sqlite3.connect(USERS_DB, isolation_level=None, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA busy_timeout=5000")
+                conn.executescript(_SCHEMA)
+                _migrate_json(conn)
+                _normalize_notify_times(conn)
+                _conn = conn
+    return _conn
+
+def _migrate_json(conn: sqlite3.Connection) -> None:
+    """One-time import of the legacy users.json file."""
+    if not os.path.exists(USERS_FILE):
+        return
     try:
         with open(USERS_FILE, "r") as f:
             users = json.load(f)
-        return users.get(str(user_id))
-    except (FileNotFoundError, json.JSONDecodeError):
-        return None
+    except json.JSONDecodeError:
+        logger.error(f"Could not migrate {USERS_FILE}: file is not valid JSON.")
+        return
 
-def save_user(user_id: int, data: Dict[str, Any]) -> None:
-    """Saves or updates a user's data in the JSON file."""
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        with open(USERS_FILE, "r") as f:
-            users = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        users = {}
+        for user_id, data in users.items():
+            if conn.execute("SELECT 1 FROM users WHERE user_id = ?", (int(user_id),)).fetchone() is None:
+                _write(conn, user_id, data)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    os.replace(USERS_FILE, USERS_FILE + ".migrated")
+    logger.info(f"Migrated {len(users)} users from {USERS_FILE} to {USERS_DB}.")
+
+def normalize_notify_time(notify_time: str) -> str:
+    """Normalizes a notification time to its HH:MM minute slot, e.g. '0700' -> '07:00'."""
+    return time.fromisoformat(notify_time).strftime("%H:%M")
+
+def _normalize_notify_times(conn: sqlite3.Connection) -> None:
+    """
+    Rewrites notify times stored in other formats ('0700', '07', '07:00:00')
+    as HH:MM so the slot jobs' lookups find them.
+    """
+    rows = conn.execute(
+        "SELECT user_id, data FROM users WHERE notify_time NOT GLOB '[0-2][0-9]:[0-5][0-9]'"
+    ).fetchall()
+    fixed = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for user_id, raw in rows:
+            try:
+                data = json.loads(raw)
+                normalize_notify_time(data["notify_time"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            _write(conn, user_id, data)
+            fixed += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if fixed:
+        logger.info(f"Normalized the notification time of {fixed} users.")
+
+def _write(conn: sqlite3.Connection, user_id: int, data: Dict[str, Any]) -> None:
+    if data.get("notify_time"):
+        try:
+            data = {**data, "notify_time": normalize_notify_time(data["notify_time"])}
+        except (TypeError, ValueError):
+            # Kept as is; the startup slot scan reports it
+            pass
+    conn.execute(
+        'INSERT OR REPLACE INTO users (user_id, "group", notify_time, data) VALUES (?, ?, ?, ?)',
+        (int(user_id), data.get("group"), data.get("notify_time"), json.dumps(data)),
+    )
 
-    users[str(user_id)] = data
+@STORAGE_SECONDS.time(op="get_user")
+def get_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """Retrieves a user's data by primary key."""
+    with _lock:
+        row = _get_conn().execute("SELECT data FROM users WHERE user_id = ?", (int(user_id),)).fetchone()
+    return json.loads(row[0]) if row else None
 
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=4)
+@STORAGE_SECONDS.time(op="save_user")
+def save_user(user_id: int, data: Dict[str, Any]) -> None:
+    """Saves or updates a user's data in a single atomic write."""
+    with _lock:
+        _write(_get_conn(), user_id, data)
 
+@STORAGE_SECONDS.time(op="set_user_field")
 def set_user_field(user_id: int, field: str, value: Any) -> None:
-    """Sets a specific field for a user."""
-    user_data = get_user(user_id)
-    if user_data:
-        user_data[field] = value
-        save_user(user_id, user_data)
+    """Sets a specific field for a user inside one transaction."""
+    with _lock:
+        conn = _get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM users WHERE user_id = ?", (int(user_id),)).fetchone()
+            if row:
+                user_data = json.loads(row[0])
+                user_data[field] = value
+                _write(conn, user_id, user_data)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
 
+@STORAGE_SECONDS.time(op="get_all_users")
 def get_all_users() -> List[Dict[str, Any]]:
-    """Retriedves all users from the JSON file."""
-    try:
-        with open(USERS_FILE, "r") as f:
-            users = json.load(f)
-        return list(users.values())
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+    """Retrieves all users."""
+    with _lock:
+        rows = _get_conn().execute("SELECT data FROM users").fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+@STORAGE_SECONDS.time(op="get_users_by_group")
+def get_users_by_group(group: str) -> List[Dict[str, Any]]:
+    """Retrieves all users of a group using the group index."""
+    with _lock:
+        rows = _get_conn().execute('SELECT data FROM users WHERE "group" = ?', (group,)).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+@STORAGE_SECONDS.time(op="get_users_by_notify_time")
+def get_users_by_notify_time(notify_time: str) -> List[Dict[str, Any]]:
+    """Retrieves all users subscribed at a given HH:MM using the notify_time index."""
+    with _lock:
+        rows = _get_conn().execute("SELECT data FROM users WHERE notify_time = ?", (notify_time,)).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+@STORAGE_SECONDS.time(op="get_notify_times")
+def get_notify_times() -> List[str]:
+    """Returns every distinct HH:MM that has at least one subscriber."""
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT DISTINCT notify_time FROM users WHERE notify_time IS NOT NULL"
+        ).fetchall()
+    return [row[0] for row in rows]
+
+def iter_users(batch_size: int = 500) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    """
+    Streams (user_id, data) in user_id order, one batch per query, so the
+    whole table is never held in memory. Rows whose data is not valid JSON
+    are yielded with data=None.
+    """
+    last_id = None
+    while True:
+        with _lock:
+            if last_id is None:
+                rows = _get_conn().execute(
+                    "SELECT user_id, data FROM users ORDER BY user_id LIMIT ?", (batch_size,)
+                ).fetchall()
+            else:
+                rows = _get_conn().execute(
+                    "SELECT user_id, data FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+        if not rows:
+            return
+        for user_id, raw in rows:
+            try:
+                data = json.loads(raw)
+            except (TypeError, ValueError):
+                data = None
+            yield user_id, data
+        last_id = rows[-1][0]
@@ -0,0 +1,147 @@
+import asyncio
+
+from cache import TimetableCache
+
+TIMETABLE = {
+    "Monday": [{"time": "1", "subject": "Fizika", "lecturer": "Yusupov B.", "room": "174-xona"}],
+    "Tuesday": [{"time": "2", "subject": "Falsafa", "lecturer": "Qodirov M.", "room": "193-xona"}],
+}
+
+
+def make_cache(responses, **kwargs):
+    """A cache whose fetch returns the given timetables in turn."""
+    responses = list(responses)
+    calls = []
+
+    async def fetch(faculty_id, group):
+        calls.append(group)
+        return responses.pop(0)
+
+    return TimetableCache(fetch, ttl=60, max_size=10, stale_serve_after=1, **kwargs), calls
+
+
+def test_empty_result_is_not_pinned():
+    async def scenario():
+        cache, calls = make_cache([{}, TIMETABLE])
+        first = await cache.get_snapshot("1", "911-21")
+        second = await cache.get_snapshot("1", "911-21")
+        return first, second, calls
+
+    first, second, calls = asyncio.run(scenario())
+    assert first.timetable == {}
+    assert second.timetable == TIMETABLE
+    assert calls == ["911-21", "911-21"]
+
+
+def test_empty_refresh_serves_previous_copy():
+    async def scenario():
+        cache, _ = make_cache([{}])
+        cache.put("1", "911-21", TIMETABLE, ttl=-1)
+        snapshot = await cache.get_snapshot("1", "911-21")
+        return cache, snapshot
+
+    cache, snapshot = asyncio.run(scenario())
+    assert snapshot.timetable == TIMETABLE
+    assert snapshot.stale
+    assert cache.peek_snapshot("1", "911-21").timetable == TIMETABLE
+
+
+def test_put_ignores_empty_timetable():
+    cache, _ = make_cache([])
+    changes = []
+    cache.add_listener(lambda *args: changes.append(args))
+    cache.put("1", "911-21", TIMETABLE)
+    assert cache.put("1", "911-21", {}) == TIMETABLE
+    assert cache.peek_snapshot("1", "911-21").timetable == TIMETABLE
+    assert len(changes) == 1
+
+
+WEEK = {
+    day: [{"time": "1", "subject": f"Fan {day}", "lecturer": "Karimov A.", "room": "101-xona"}]
+    for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+}
+ERROR_PAGE = {"Monday": WEEK["Monday"]}
+
+
+def test_implausible_result_needs_confirmation():
+    cache, _ = make_cache([])
+    changes = []
+    cache.put("1", "911-21", WEEK)
+    cache.add_listener(lambda *args: changes.append(args))
+
+    # Four of five days vanished: kept back once, no change pushed
+    assert cache.put("1", "911-21", ERROR_PAGE) == WEEK
+    assert changes == []
+    # A good crawl in between clears the suspicion
+    cache.put("1", "911-21", WEEK)
+    assert cache.put("1", "911-21", ERROR_PAGE) == WEEK
+    assert changes == []
+    # The same result on the next fetch is accepted as a real change
+    assert cache.put("1", "911-21", ERROR_PAGE) == ERROR_PAGE
+    assert len(changes) == 1
+
+
+def test_maintenance_page_does_not_push_cancellations():
+    async def scenario():
+        cache, _ = make_cache([{}, ERROR_PAGE])
+        cache.put("1", "911-21", WEEK, ttl=-1)
+        changes = []
+        cache.add_listener(lambda *args: changes.append(args))
+        first = await cache.get_snapshot("1", "911-21")
+        second = await cache.get_snapshot("1", "911-21")
+        return first, second, changes
+
+    first, second, changes = asyncio.run(scenario())
+    assert first.timetable == WEEK and first.stale
+    assert second.timetable == WEEK and second.stale
+    assert changes == []
+
+
+def test_confirmed_reduction_is_accepted_through_get_snapshot():
+    async def scenario():
+        cache, calls = make_cache([ERROR_PAGE, ERROR_PAGE])
+        cache.put("1", "911-21", WEEK, ttl=-1)
+        changes = []
+        cache.add_listener(lambda *args: changes.append(args))
+        first = await cache.get_snapshot("1", "911-21")
+        second = await cache.get_snapshot("1", "911-21")
+        third = await cache.get_snapshot("1", "911-21")
+        return first, second, third, calls, changes
+
+    first, second, third, calls, changes = asyncio.run(scenario())
+    assert first.timetable == WEEK and first.stale
+    assert second.timetable == ERROR_PAGE and not second.stale
+    # The accepted copy is fresh again, so it is served without refetching
+    assert third.timetable == ERROR_PAGE and not third.stale
+    assert len(calls) == 2
+    assert len(changes) == 1
+
+
+def test_confirmed_empty_timetable_is_accepted():
+    async def scenario():
+        cache, calls = make_cache([{}, {}, {}])
+        # Every stored copy expires at once, so each request refreshes
+        cache.ttl = -1
+        cache.put("1", "911-21", TIMETABLE)
+        snapshots = [await cache.get_snapshot("1", "911-21") for _ in range(3)]
+        return snapshots, calls
+
+    (first, second, third), calls = asyncio.run(scenario())
+    assert first.timetable == TIMETABLE and first.stale
+    assert second.timetable == {} and not second.stale
+    # Once accepted, a still-empty timetable stays accepted
+    assert third.timetable == {} and not third.stale
+    assert len(calls) == 3
+
+
+def test_peek_flags_only_failed_refreshes_as_stale():
+    async def scenario():
+        cache, _ = make_cache([{}])
+        cache.put("1", "911-21", TIMETABLE, ttl=-1)
+        expired = cache.peek_snapshot("1", "911-21")
+        await cache.get_snapshot("1", "911-21")
+        return expired, cache.peek_snapshot("1", "911-21")
+
+    expired, failed = asyncio.run(scenario())
+    assert not expired.stale
+    assert failed.stale
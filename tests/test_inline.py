@@ -0,0 +1,54 @@
+import pytest
+
+import main
+from cache import TimetableCache
+from catalog import GroupCatalog
+from render import MESSAGE_LIMIT
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+
+def busy_week():
+    lesson = {"subject": "Ma'lumotlar bazasi va axborot tizimlari (amaliy mashg'ulot, 2-guruh)", "lecturer": "Rahimova D.", "room": "193-xona"}
+    return {day: [dict(lesson, time=str(para)) for para in range(1, 12)] for day in DAYS}
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    """A fresh catalog in place of the process-wide one."""
+    instance = GroupCatalog()
+    monkeypatch.setattr(main, "catalog", instance)
+    return instance
+
+
+@pytest.fixture
+def timetable_cache(monkeypatch):
+    """A fresh, offline cache in place of the process-wide one."""
+    async def fetch(faculty_id, group):
+        raise AssertionError("inline answers must not fetch")
+
+    instance = TimetableCache(fetch, ttl=60, max_size=10)
+    monkeypatch.setattr(main, "timetable_cache", instance)
+    return instance
+
+
+def test_long_week_is_paginated_not_truncated(catalog, timetable_cache):
+    catalog.set_groups("9", ["999-99"])
+    timetable_cache.put("9", "999-99", busy_week())
+
+    results, stale = main.build_inline_results(1, "999-99 hafta")
+    texts = [result.input_message_content.message_text for result in results]
+    assert not stale
+    assert len(results) > 1
+    assert all(len(text) <= MESSAGE_LIMIT for text in texts)
+    assert results[0].title.endswith(f"(1/{len(results)})")
+    # Every lesson of the week made it into one of the parts
+    assert sum(text.count("193-xona") for text in texts) == 11 * len(DAYS)
+    assert len({result.id for result in results}) == len(results)
+
+
+def test_result_id_fits_in_64_bytes():
+    result_id = main.inline_result_id("1", "Ж" * 40, "Wednesday", 1)
+    assert len(result_id.encode()) <= 64
+    assert result_id != main.inline_result_id("1", "Ж" * 40, "Wednesday", 2)
+    assert main.inline_result_id("1", "911-21", "Friday", 1) == "1:911-21:Friday:1"
@@ -0,0 +1,31 @@
+import importlib
+import threading
+import time
+
+from metrics import Histogram, render_metrics
+
+
+def test_decorator_timer_is_per_call():
+    histogram = Histogram("test_decorated_seconds", "Test.", ["op"])
+
+    @histogram.time(op="sleep")
+    def work(delay):
+        time.sleep(delay)
+
+    threads = [threading.Thread(target=work, args=(delay,)) for delay in (0.2, 0.0)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # A shared start time would count the slow call twice or not at all
+    total = histogram._values[("sleep",)][-2]
+    assert 0.2 <= total < 0.3
+
+
+def test_gauges_are_registered_once():
+    # Importing the bot registers every module's metrics
+    importlib.import_module("main")
+
+    text = render_metrics()
+    for name in ("send_queue_depth", "timetable_cache_entries", "upstream_circuit_open"):
+        assert text.count(f"# TYPE {name} ") == 1
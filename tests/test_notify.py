@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+
+import main
+from cache import Snapshot
+
+TIMETABLE = {day: [{"time": "1", "subject": "Fizika", "lecturer": "Yusupov B.", "room": "174-xona"}]
+             for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]}
+
+
+class FakeCache:
+    async def get_snapshot(self, faculty_id, group):
+        if group == "broken":
+            raise ValueError("parser bug")
+        return Snapshot(TIMETABLE, 0, False)
+
+
+class FakeQueue:
+    def __init__(self):
+        self.messages = []
+
+    async def broadcast(self, messages, **kwargs):
+        self.messages.extend(messages)
+
+
+def test_failing_group_does_not_drop_the_slot(monkeypatch):
+    users = [
+        {"user_id": 1, "faculty_id": 1, "group": "broken"},
+        {"user_id": 2, "faculty_id": 1, "group": "911-21"},
+    ]
+    monkeypatch.setattr(main, "get_users_by_notify_time", lambda slot: users)
+    monkeypatch.setattr(main, "timetable_cache", FakeCache())
+    queue = FakeQueue()
+    context = SimpleNamespace(job=SimpleNamespace(data="08:00"), bot_data={"send_queue": queue})
+
+    asyncio.run(main.notification_slot_job(context))
+    assert [chat_id for chat_id, _ in queue.messages] == [2]
+
+
+class FakeProcess:
+    def __init__(self, name, alive):
+        self.name, self.alive, self.exitcode = name, alive, None if alive else 1
+
+    def is_alive(self):
+        return self.alive
+
+
+def test_dead_worker_is_respawned(monkeypatch):
+    spawned = []
+    monkeypatch.setattr(main, "spawn_worker", lambda shard, shards: spawned.append((shard, shards)) or FakeProcess("new", True))
+    workers = [FakeProcess("notify-worker-0", True), FakeProcess("notify-worker-1", False)]
+
+    asyncio.run(main.worker_check_job(SimpleNamespace(job=SimpleNamespace(data=workers))))
+    assert spawned == [(1, 2)]
+    assert workers[1].name == "new"
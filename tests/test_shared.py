@@ -0,0 +1,41 @@
+import asyncio
+
+from cache import TimetableCache
+from catalog import GroupCatalog
+from shared import SharedStore
+from snapshot import load_snapshot, save_snapshot
+
+TIMETABLE = {
+    "Monday": [{"time": "1", "subject": "Fizika", "lecturer": "Yusupov B.", "room": "174-xona"}],
+    "Thursday": [{"time": "2", "subject": "Falsafa", "lecturer": "Qodirov M.", "room": "193-xona"}],
+}
+
+
+async def fetch_never(faculty_id, group):
+    raise AssertionError("should be served from the shared store")
+
+
+def test_snapshot_views_are_written_to_the_shared_store(tmp_path):
+    path = str(tmp_path / "timetables.snap")
+    source = TimetableCache(fetch_never, ttl=60, max_size=10)
+    source.put("1", "911-21", TIMETABLE)
+    asyncio.run(save_snapshot(path, source, GroupCatalog()))
+
+    store = SharedStore(str(tmp_path / "shared.db"))
+    front = TimetableCache(fetch_never, ttl=60, max_size=10, shared=store)
+    load_snapshot(path, front, GroupCatalog(), ttl=3600)
+    # An unchanged crawl keeps the restored view and writes it through
+    front.put("1", "911-21", TIMETABLE)
+
+    assert store.load("1", "911-21").timetable == TIMETABLE
+    worker = TimetableCache(fetch_never, ttl=60, max_size=10, shared=store)
+    assert asyncio.run(worker.get("1", "911-21")) == TIMETABLE
+
+
+def test_lease_is_exclusive_until_it_expires(tmp_path):
+    store = SharedStore(str(tmp_path / "shared.db"))
+    assert store.acquire_lease("notify:07:00", 60, owner="a")
+    assert not store.acquire_lease("notify:07:00", 60, owner="b")
+    assert store.acquire_lease("notify:07:00", 60, owner="a")
+    assert store.acquire_lease("notify:08:00", -1, owner="a")
+    assert store.acquire_lease("notify:08:00", 60, owner="b")
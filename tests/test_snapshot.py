@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from cache import TimetableCache
+from catalog import GroupCatalog
+from snapshot import load_snapshot, save_snapshot
+
+TIMETABLES = {
+    ("1", "911-21"): {
+        "Monday": [
+            {"time": "1", "subject": "Fizika", "lecturer": "Yusupov B.", "room": "174-xona"},
+            {"time": "3", "subject": "Ma'lumotlar bazasi", "lecturer": "N/A", "room": "N/A"},
+        ],
+        "Friday": [{"time": "2", "subject": "Fizika", "lecturer": "Yusupov B.", "room": "174-xona"}],
+    },
+    ("2", "Ж-11"): {
+        "Tuesday": [{"time": "1", "subject": "Ingliz tili", "lecturer": "Aliyeva N.", "room": "318-xona"}],
+    },
+}
+
+
+async def fetch_never(faculty_id, group):
+    raise AssertionError("the snapshot must be served without fetching")
+
+
+def make_cache():
+    return TimetableCache(fetch_never, ttl=60, max_size=10)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "timetables.snap")
+    cache, catalog = make_cache(), GroupCatalog()
+    catalog.faculties = {"Fizika-matematika": "1", "Filologiya": "2"}
+    catalog.set_groups("1", ["911-21", "912-21"])
+    catalog.set_groups("2", ["Ж-11"])
+    for (faculty_id, group), timetable in TIMETABLES.items():
+        cache.put(faculty_id, group, timetable)
+
+    assert asyncio.run(save_snapshot(path, cache, catalog)) == 2
+
+    loaded_cache, loaded_catalog = make_cache(), GroupCatalog()
+    info = load_snapshot(path, loaded_cache, loaded_catalog, ttl=3600)
+    assert info["groups"] == 2
+    assert loaded_catalog.faculties == catalog.faculties
+    assert loaded_catalog.groups == catalog.groups
+
+    original = {(f, g): (fetched_at, hashes) for f, g, _, fetched_at, hashes in cache.entries()}
+    for faculty_id, group, timetable, fetched_at, hashes in loaded_cache.entries():
+        assert {day: list(lessons) for day, lessons in timetable.items()} == TIMETABLES[(faculty_id, group)]
+        assert (fetched_at, hashes) == original[(faculty_id, group)]
+
+    snapshot = asyncio.run(loaded_cache.get_snapshot("1", "911-21"))
+    assert not snapshot.stale
+    assert snapshot.timetable["Friday"][0]["room"] == "174-xona"
+
+
+def test_expired_snapshot_is_kept_as_last_known_good_copy(tmp_path):
+    path = str(tmp_path / "timetables.snap")
+    cache = make_cache()
+    cache.put("1", "911-21", TIMETABLES[("1", "911-21")])
+    asyncio.run(save_snapshot(path, cache, GroupCatalog()))
+
+    loaded = make_cache()
+    load_snapshot(path, loaded, GroupCatalog(), ttl=-1)
+    snapshot = loaded.peek_snapshot("1", "911-21")
+    # Expired but never failed to refresh, so no outage note
+    assert not snapshot.stale
+    assert snapshot.timetable == TIMETABLES[("1", "911-21")]
+    assert snapshot.fetched_at <= time.time()
+
+
+def test_missing_file(tmp_path):
+    assert load_snapshot(str(tmp_path / "missing.snap"), make_cache(), GroupCatalog()) is None
@@ -0,0 +1,106 @@
+"""Checks the single-pass parser against the original per-cell re-parsing implementation."""
+import glob
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+import timetable
+from timetable import DAYS_MAP, parse_timetable
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "bench", "fixtures", "ajax_*.html")))
+
+
+def reference_parse(content):
+    """The original get_timetable parsing code, kept verbatim as the reference."""
+    timetable = {}
+    soup = BeautifulSoup(content, "html.parser")
+    rows = soup.find_all('tr')
+    if not rows or len(rows) < 2:
+        return {}
+    header_cells = rows[0].find_all('th')
+    day_columns = {i: cell.text.strip() for i, cell in enumerate(header_cells) if cell.text.strip() in DAYS_MAP}
+    for row in rows[1:]:
+        cells = row.find_all('td')
+        if not cells or len(cells) <= 1:
+            continue
+        para_num = cells[0].text.strip()
+        for i, day_name_uz in day_columns.items():
+            if len(cells) > i:
+                cell = cells[i]
+                day_name_en = DAYS_MAP[day_name_uz]
+                for part_html in str(cell).split('<hr/>'):
+                    part_soup = BeautifulSoup(part_html, 'html.parser')
+                    for br in part_soup.find_all("br"):
+                        br.replace_with("\n")
+                    lines = [line.strip() for line in part_soup.text.split('\n') if line.strip()]
+                    if not lines or "dars yo'q" in ' '.join(lines).lower():
+                        continue
+                    subject = part_soup.find('b').text.strip() if part_soup.find('b') else lines[0]
+                    room = next((line for line in lines if 'xona' in line.lower()), "N/A")
+                    lecturer = "N/A"
+                    for line in lines:
+                        if line != subject and line != room and not line.lower().startswith(('amaliyot', 'ma\'ruza', 'laboratoriya')):
+                            lecturer = line
+                            break
+                    timetable.setdefault(day_name_en, []).append({
+                        "time": para_num,
+                        "subject": subject,
+                        "lecturer": lecturer,
+                        "room": room,
+                    })
+    return timetable
+
+
+HEADER = "<tr><th>Para</th><th>Dushanba</th><th>Seshanba</th><th>Chorshanba</th></tr>"
+LESSON = "<b>Fizika</b><br>Amaliyot<br>Yusupov B.<br>174-xona"
+
+EDGE_CASES = {
+    "empty_table": "<table></table>",
+    "header_only": f"<table>{HEADER}</table>",
+    "no_table": "<html><body><h1>Texnik ishlar</h1></body></html>",
+    "missing_cells": f"<table>{HEADER}<tr><td>1</td><td>{LESSON}</td></tr><tr><td>2</td></tr></table>",
+    "rowspan": (
+        f"<table>{HEADER}"
+        f"<tr><td>1</td><td rowspan=\"2\">{LESSON}</td><td>Dars yo'q</td><td>{LESSON}<hr>{LESSON}</td></tr>"
+        f"<tr><td>2</td><td>{LESSON}</td><td>{LESSON}</td></tr></table>"
+    ),
+    "no_bold_subject": f"<table>{HEADER}<tr><td>1</td><td>Sport<br>Karimov A.<br>12-xona</td></tr></table>",
+}
+
+
+@pytest.fixture(params=["html.parser", "lxml"])
+def backend(request, monkeypatch):
+    if request.param != "html.parser":
+        pytest.importorskip(request.param)
+    monkeypatch.setattr(timetable, "HTML_PARSER", request.param)
+    return request.param
+
+
+def test_fixtures_present():
+    assert FIXTURES
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_matches_reference_on_fixtures(backend, path):
+    with open(path, "rb") as f:
+        content = f.read()
+    parsed = parse_timetable(content)
+    assert parsed
+    assert parsed == reference_parse(content)
+
+
+@pytest.mark.parametrize("name", sorted(EDGE_CASES))
+def test_matches_reference_on_edge_cases(backend, name):
+    content = EDGE_CASES[name].encode()
+    assert parse_timetable(content) == reference_parse(content)
+
+
+def test_empty_table_parses_to_nothing(backend):
+    assert parse_timetable(EDGE_CASES["empty_table"].encode()) == {}
+    assert parse_timetable(EDGE_CASES["header_only"].encode()) == {}
+
+
+def test_missing_cells_are_skipped(backend):
+    parsed = parse_timetable(EDGE_CASES["missing_cells"].encode())
+    assert parsed == {"Monday": [{"time": "1", "subject": "Fizika", "lecturer": "Yusupov B.", "room": "174-xona"}]}
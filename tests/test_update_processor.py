@@ -0,0 +1,58 @@
+import asyncio
+import datetime
+import time
+
+from telegram import Chat, Message, Update, User
+
+from update_processor import PerUserUpdateProcessor
+
+
+def make_update(user_id: int, update_id: int) -> Update:
+    chat = Chat(user_id, "private")
+    message = Message(update_id, datetime.datetime.now(), chat, from_user=User(user_id, "x", False))
+    return Update(update_id, message=message)
+
+
+def test_burst_from_one_user_does_not_block_others():
+    async def scenario():
+        processor = PerUserUpdateProcessor(4)
+        finished = {}
+
+        async def work(key, delay):
+            await asyncio.sleep(delay)
+            finished[key] = time.monotonic()
+
+        started = time.monotonic()
+        tasks = [asyncio.create_task(processor.process_update(make_update(1, i), work((1, i), 0.02)))
+                 for i in range(20)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(processor.process_update(make_update(2, 99), work((2, 99), 0))))
+        await asyncio.gather(*tasks)
+        return started, finished
+
+    started, finished = asyncio.run(scenario())
+    # The other user's update runs right away instead of after the burst
+    assert finished[(2, 99)] - started < 0.1
+    # The burst itself stays in order
+    burst = [finished[(1, i)] for i in range(20)]
+    assert burst == sorted(burst)
+
+
+def test_limit_is_reported_and_enforced():
+    async def scenario():
+        processor = PerUserUpdateProcessor(4)
+        running, peak = 0, 0
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await asyncio.gather(*(processor.process_update(make_update(i, i), work()) for i in range(12)))
+        return processor, peak
+
+    processor, peak = asyncio.run(scenario())
+    assert processor.max_concurrent_updates == 4
+    assert peak == 4
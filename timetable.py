@@ -1,14 +1,136 @@
-import requests
-from bs4 import BeautifulSoup
-from typing import Dict, List, Optional
+import asyncio
+import httpx
+import logging
+import time
+from bs4 import BeautifulSoup, CData, FeatureNotFound, NavigableString, Tag
+from typing import Dict, List, Optional, Tuple
 import re
 from urllib.parse import urljoin
 
+from config import (
+    TIMETABLE_URL,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    TIMETABLE_PARSER,
+    UPSTREAM_DEADLINE,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+)
+
+from metrics import UPSTREAM_SECONDS, UPSTREAM_ERRORS, PARSE_SECONDS, Gauge
+
+logger = logging.getLogger(__name__)
+
 # Base URL for the timetable website
-BASE_URL = "https://data.guldu.uz/dars/"
+BASE_URL = TIMETABLE_URL
 AJAX_URL = urljoin(BASE_URL, "ajax.php")
 
-def get_faculties() -> Dict[str, str]:
+# Shared keep-alive client, created lazily inside the running event loop
+_client: Optional[httpx.AsyncClient] = None
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide pooled HTTP client.
+    All upstream requests reuse its TCP/TLS connections.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            follow_redirects=True,
+        )
+    return _client
+
+async def close_client() -> None:
+    """Closes the pooled HTTP client. Called on application shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+class UpstreamError(Exception):
+    """Raised when data.guldu.uz is unreachable, too slow, or answers with an error."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling the website after repeated failures. Once `reset_timeout`
+    has passed, a single trial request is let through; its outcome closes
+    the circuit again or keeps it open.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if not self._trial_running and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Upstream recovered, closing circuit.")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+            if self.opened_at is None:
+                logger.warning(f"Upstream failed {self.failures} times in a row, opening circuit.")
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+
+    def release_trial(self) -> None:
+        """Lets another trial through if the current one was cancelled."""
+        self._trial_running = False
+
+
+breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+Gauge("upstream_circuit_open", "1 while the upstream circuit breaker is open.", lambda: breaker.is_open)
+
+async def _request(endpoint: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Sends one upstream request through the circuit breaker with a hard deadline.
+    Raises UpstreamError on any failure.
+    """
+    if not breaker.allow():
+        raise UpstreamError(f"Circuit open, skipped {endpoint} request")
+    try:
+        with UPSTREAM_SECONDS.time(endpoint=endpoint):
+            response = await asyncio.wait_for(get_client().request(method, url, **kwargs), UPSTREAM_DEADLINE)
+            response.raise_for_status()
+    except (httpx.HTTPError, asyncio.TimeoutError) as e:
+        breaker.record_failure()
+        UPSTREAM_ERRORS.inc(endpoint=endpoint)
+        raise UpstreamError(f"{endpoint} request failed: {e!r}") from e
+    except asyncio.CancelledError:
+        breaker.release_trial()
+        raise
+    breaker.record_success()
+    return response
+
+async def get_faculties() -> Dict[str, str]:
     """
     Fetches the list of faculties and their corresponding IDs from the main page.
     Returns a dictionary mapping faculty name to faculty ID.
@@ -16,9 +138,9 @@ def get_faculties() -> Dict[str, str]:
     """
     faculties = {}
     try:
-        response = requests.get(BASE_URL)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
+        response = await _request("faculties", "GET", BASE_URL)
+        with PARSE_SECONDS.time(page="faculties"):
+            soup = BeautifulSoup(response.content, "html.parser")
         
         # Find all links that look like faculty links
         faculty_links = soup.select('div.col-md-4 a.btn, div.col-md-3 a.btn')
@@ -32,20 +154,20 @@ def get_faculties() -> Dict[str, str]:
                 if match:
                     faculty_id = match.group(1)
                     faculties[faculty_name] = faculty_id
-    except requests.RequestException as e:
-        print(f"Error fetching faculties: {e}")
+    except UpstreamError as e:
+        logger.error(f"Error fetching faculties: {e}")
     return faculties
 
-def get_groups_by_faculty(faculty_id: str) -> List[str]:
+async def get_groups_by_faculty(faculty_id: str) -> List[str]:
     """
     Fetches the list of group names for a given faculty ID.
     """
     groups = []
     faculty_url = urljoin(BASE_URL, f"index.php?fak={faculty_id}")
     try:
-        response = requests.get(faculty_url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
+        response = await _request("groups", "GET", faculty_url)
+        with PARSE_SECONDS.time(page="groups"):
+            soup = BeautifulSoup(response.content, "html.parser")
         
         # Groups are in <h3> tags, e.g., <h3>911-21</h3>
         group_tags = soup.find_all('h3')
@@ -54,87 +176,155 @@ def get_groups_by_faculty(faculty_id: str) -> List[str]:
             # Basic validation to ensure it looks like a group name
             if group_name and re.search(r'\d', group_name):
                 groups.append(group_name)
-    except requests.RequestException as e:
-        print(f"Error fetching groups for faculty {faculty_id}: {e}")
+    except UpstreamError as e:
+        logger.error(f"Error fetching groups for faculty {faculty_id}: {e}")
     return sorted(groups)
 
-def get_timetable(faculty_id: str, group: str) -> Dict[str, List[Dict[str, str]]]:
+DAYS_MAP = {
+    "Dushanba": "Monday", "Seshanba": "Tuesday", "Chorshanba": "Wednesday",
+    "Payshanba": "Thursday", "Juma": "Friday", "Shanba": "Saturday"
+}
+
+_LESSON_TYPE_PREFIXES = ('amaliyot', 'ma\'ruza', 'laboratoriya')
+
+# String types that count as visible text (same as Tag.get_text)
+_TEXT_TYPES = (NavigableString, CData)
+
+
+class _LessonSplitter:
+    """
+    Walks one table cell in document order and splits it into lessons at
+    every <hr>, turning <br> into line breaks. Each lesson collects its text
+    and the text of its first <b> tag (the subject) in a single pass.
+    """
+
+    def __init__(self):
+        self.segments: List[Dict[str, Optional[List[str]]]] = []
+        self._new_segment()
+
+    def _new_segment(self) -> None:
+        self.current = {"text": [], "subject": None}
+        self.segments.append(self.current)
+
+    def walk(self, node: Tag, subject: Optional[List[str]] = None) -> None:
+        for child in node.children:
+            if isinstance(child, Tag):
+                if child.name == 'hr':
+                    self._new_segment()
+                    subject = None
+                elif child.name == 'br':
+                    self.current["text"].append("\n")
+                    if subject is not None:
+                        subject.append("\n")
+                elif child.name == 'b' and self.current["subject"] is None:
+                    self.current["subject"] = []
+                    self.walk(child, self.current["subject"])
+                else:
+                    self.walk(child, subject)
+                # An <hr> nested in this child ends the subject with its segment
+                if subject is not None and subject is not self.current["subject"]:
+                    subject = None
+            elif type(child) in _TEXT_TYPES:
+                self.current["text"].append(child)
+                if subject is not None:
+                    subject.append(child)
+
+
+def _parse_cell(cell: Tag) -> List[Tuple[str, str, str]]:
+    """Returns (subject, lecturer, room) for each lesson in a table cell."""
+    splitter = _LessonSplitter()
+    splitter.walk(cell)
+
+    lessons = []
+    for segment in splitter.segments:
+        lines = [line.strip() for line in ''.join(segment["text"]).split('\n') if line.strip()]
+
+        if not lines or "dars yo'q" in ' '.join(lines).lower():
+            continue
+
+        # Heuristics to find subject, lecturer, and room
+        subject = ''.join(segment["subject"]).strip() if segment["subject"] is not None else lines[0]
+        room = next((line for line in lines if 'xona' in line.lower()), "N/A")
+
+        # Assume lecturer is the line that is not the subject and not the room
+        lecturer = "N/A"
+        for line in lines:
+            if line != subject and line != room and not line.lower().startswith(_LESSON_TYPE_PREFIXES):
+                lecturer = line
+                break
+
+        lessons.append((subject, lecturer, room))
+    return lessons
+
+def _resolve_parser(name: str) -> str:
+    """Falls back to the built-in parser when an optional backend is missing."""
+    if name == "html.parser":
+        return name
+    try:
+        BeautifulSoup("", name)
+        return name
+    except FeatureNotFound:
+        logger.warning(f"HTML parser backend {name!r} is not installed, using html.parser.")
+        return "html.parser"
+
+HTML_PARSER = _resolve_parser(TIMETABLE_PARSER)
+
+def parse_timetable(content: bytes, timetable: Optional[Dict[str, List[Dict[str, str]]]] = None) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Parses the ajax.php timetable table in a single tree walk.
+    Lessons are appended to `timetable` (a new dict by default) as they are
+    parsed, so a failure midway keeps everything parsed before it.
+    """
+    if timetable is None:
+        timetable = {}
+    soup = BeautifulSoup(content, HTML_PARSER)
+
+    rows = soup.find_all('tr')
+    if not rows or len(rows) < 2:
+        return timetable
+
+    # The actual day names are in the first row, second cell onwards
+    header_cells = rows[0].find_all('th')
+    # Mapping of table index to English day name (e.g., {1: "Monday"})
+    day_columns = {}
+    for i, cell in enumerate(header_cells):
+        day_name_uz = cell.text.strip()
+        if day_name_uz in DAYS_MAP:
+            day_columns[i] = DAYS_MAP[day_name_uz]
+
+    for row in rows[1:]:
+        cells = row.find_all('td')
+        if not cells or len(cells) <= 1:
+            continue
+
+        para_num = cells[0].text.strip()
+
+        for i, day_name_en in day_columns.items():
+            if len(cells) > i:
+                for subject, lecturer, room in _parse_cell(cells[i]):
+                    timetable.setdefault(day_name_en, []).append({
+                        "time": para_num,
+                        "subject": subject,
+                        "lecturer": lecturer,
+                        "room": room,
+                    })
+    return timetable
+
+async def get_timetable(faculty_id: str, group: str) -> Dict[str, List[Dict[str, str]]]:
     """
     Fetches the weekly timetable for a specific group.
     Returns a dictionary where keys are days of the week in English.
+    Raises UpstreamError if the website could not be fetched, so an outage
+    is never mistaken for an empty timetable.
     """
+    payload = {'fak': faculty_id, 'q': group}
+    response = await _request("timetable", "POST", AJAX_URL, data=payload)
+
     timetable = {}
-    days_map = {
-        "Dushanba": "Monday", "Seshanba": "Tuesday", "Chorshanba": "Wednesday",
-        "Payshanba": "Thursday", "Juma": "Friday", "Shanba": "Saturday"
-    }
     try:
-        payload = {'fak': faculty_id, 'q': group}
-        response = requests.post(AJAX_URL, data=payload)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, "html.parser")
-        
-        rows = soup.find_all('tr')
-        if not rows or len(rows) < 2:
-            return {}
-
-        # The actual day names are in the first row, second cell onwards
-        header_cells = rows[0].find_all('th')
-        # Mapping of table index to day name (e.g., {1: "Dushanba"})
-        day_columns = {i: cell.text.strip() for i, cell in enumerate(header_cells) if cell.text.strip() in days_map}
-
-        for row in rows[1:]:
-            cells = row.find_all('td')
-            if not cells or len(cells) <= 1:
-                continue
-
-            para_num = cells[0].text.strip()
-
-            for i, day_name_uz in day_columns.items():
-                if len(cells) > i:
-                    cell = cells[i]
-                    day_name_en = days_map[day_name_uz]
-
-                    # Split lessons within a single cell by <hr> tag
-                    lesson_parts_html = str(cell).split('<hr/>')
-
-                    for part_html in lesson_parts_html:
-                        part_soup = BeautifulSoup(part_html, 'html.parser')
-                        
-                        # Replace <br> with newlines for easier text extraction
-                        for br in part_soup.find_all("br"):
-                            br.replace_with("\n")
-                        
-                        lines = [line.strip() for line in part_soup.text.split('\n') if line.strip()]
-                        
-                        if not lines or "dars yo'q" in ' '.join(lines).lower():
-                            continue
-
-                        # Heuristics to find subject, lecturer, and room
-                        subject = part_soup.find('b').text.strip() if part_soup.find('b') else lines[0]
-                        room = next((line for line in lines if 'xona' in line.lower()), "N/A")
-                        
-                        # Assume lecturer is the line that is not the subject and not the room
-                        lecturer = "N/A"
-                        for line in lines:
-                            if line != subject and line != room and not line.lower().startswith(('amaliyot', 'ma\'ruza', 'laboratoriya')):
-                                lecturer = line
-                                break
-                        
-                        if day_name_en not in timetable:
-                            timetable[day_name_en] = []
-                        
-                        timetable[day_name_en].append({
-                            "time": para_num,
-                            "subject": subject,
-                            "lecturer": lecturer,
-                            "room": room,
-                        })
-
-    except requests.RequestException as e:
-        print(f"Error fetching timetable for group {group}: {e}")
+        with PARSE_SECONDS.time(page="timetable"):
+            parse_timetable(response.content, timetable)
     except Exception as e:
-        print(f"Error parsing timetable for group {group}: {e}")
+        logger.exception(f"Error parsing timetable for group {group}: {e}")
         
-    return timetable
\ No newline at end of file
+    return timetable
@@ -0,0 +1,66 @@
+import asyncio
+import sys
+from typing import Awaitable, Optional
+from weakref import WeakValueDictionary
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates of different users concurrently while keeping each
+    user's updates strictly in order, so ConversationHandler state stays
+    consistent.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        # BaseUpdateProcessor.process_update takes a slot before do_process_update
+        # runs, so a burst from one user would hold every slot while waiting on its
+        # own lock. The base limit is lifted and slots are taken here instead,
+        # after the user's lock.
+        # The base constructor sizes its semaphore through the property
+        self._limit = sys.maxsize
+        super().__init__(sys.maxsize)
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        self._limit = max_concurrent_updates
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        # Locks disappear once no update of that user is pending
+        self._locks: "WeakValueDictionary[int, asyncio.Lock]" = WeakValueDictionary()
+
+    @property
+    def max_concurrent_updates(self) -> int:
+        """The real limit, enforced in do_process_update rather than by the base class."""
+        return self._limit
+
+    def _lock_for(self, update: object) -> Optional[asyncio.Lock]:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            key = update.effective_user.id
+        elif update.effective_chat is not None:
+            key = update.effective_chat.id
+        else:
+            return None
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        lock = self._lock_for(update)
+        if lock is None:
+            async with self._slots:
+                await coroutine
+            return
+        async with lock:
+            async with self._slots:
+                await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass